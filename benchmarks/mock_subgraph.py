@@ -0,0 +1,475 @@
+import os
+import re
+import sys
+import json
+import time
+import gzip
+import random
+import bisect
+import argparse
+import tempfile
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+HOST: str = '127.0.0.1'
+PORT: int = 8000
+# the hosted subgraph caps both of them
+MAX_FIRST: int = 1000
+MAX_SKIP: int = 5000
+DEFAULT_FIRST: int = 100
+DEFAULT_ROWS: str = '1e4'
+
+# entity of the schema and file of the crawl it is served from
+ENTITIES: Dict[str, str] = {
+    'daos': 'daos',
+    'events': 'events',
+    'proposals': 'proposals',
+    'proposalVotes': 'votes',
+    'proposalStakes': 'stakes',
+    'reputationHolders': 'reputationHolders',
+}
+# fields of the crawled elements which are not stored by the crawler
+DEFAULTS: Dict[str, Dict[str, Any]] = {
+    'daos': {'register': 'registered'},
+    'events': {'type': 'NewDAO'},
+}
+# filter suffixes of the 'where' argument
+OPERATORS: List[str] = ['_not_in', '_not', '_gte', '_gt', '_lte', '_lt', '_in']
+
+TOKEN_PATTERN = re.compile(r'\s*(?:(?P<string>"(?:[^"\\]|\\.)*")|(?P<number>-?\d+(?:\.\d+)?)'
+    r'|(?P<name>[A-Za-z_]\w*)|(?P<punct>[{}()\[\]:,]))')
+
+
+class QueryError(Exception):
+    """
+    Raised on queries the mock can not answer, they get a GraphQL error.
+    """
+
+
+class Field:
+    def __init__(self, name: str, alias: str, args: Dict[str, Any], fields: List['Field']):
+        self.name = name
+        self.alias = alias
+        self.args = args
+        self.fields = fields
+
+
+class Parser:
+    """
+    Parses the subset of GraphQL used by the collectors: fields with an
+    alias, arguments (strings, numbers, enums, objects and lists) and
+    nested fields.
+    """
+    def __init__(self, query: str):
+        self.tokens: List[Tuple[str, str]] = list()
+        position: int = 0
+        query = query.strip()
+        while position < len(query):
+            match = TOKEN_PATTERN.match(query, position)
+            if not match:
+                raise QueryError(f'Syntax error at {position}: {query[position:position + 20]}')
+            self.tokens.append((match.lastgroup, match.group(match.lastgroup)))
+            position = match.end()
+        self.index = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.index][1] if self.index < len(self.tokens) else None
+
+    def take(self, expected: str = None) -> Tuple[str, str]:
+        if self.index >= len(self.tokens):
+            raise QueryError('Unexpected end of query')
+        token: Tuple[str, str] = self.tokens[self.index]
+        if expected and token[1] != expected:
+            raise QueryError(f'Expected {expected} but got {token[1]}')
+        self.index += 1
+        return token
+
+    def parse(self) -> List[Field]:
+        if self.peek() == 'query':
+            self.take()
+        fields: List[Field] = self.parse_fields()
+        if self.peek() is not None:
+            raise QueryError(f'Unexpected {self.peek()}')
+        return fields
+
+    def parse_fields(self) -> List[Field]:
+        self.take('{')
+        fields: List[Field] = list()
+        while self.peek() != '}':
+            fields.append(self.parse_field())
+            if self.peek() == ',':
+                self.take()
+        self.take('}')
+        return fields
+
+    def parse_field(self) -> Field:
+        name: str = self.take()[1]
+        alias: str = name
+        if self.peek() == ':':
+            self.take()
+            name = self.take()[1]
+
+        args: Dict[str, Any] = dict()
+        if self.peek() == '(':
+            self.take()
+            while self.peek() != ')':
+                key: str = self.take()[1]
+                self.take(':')
+                args[key] = self.parse_value()
+                if self.peek() == ',':
+                    self.take()
+            self.take(')')
+
+        fields: List[Field] = self.parse_fields() if self.peek() == '{' else list()
+        return Field(name=name, alias=alias, args=args, fields=fields)
+
+    def parse_value(self) -> Any:
+        if self.peek() == '{':
+            self.take()
+            value: Dict[str, Any] = dict()
+            while self.peek() != '}':
+                key: str = self.take()[1]
+                self.take(':')
+                value[key] = self.parse_value()
+                if self.peek() == ',':
+                    self.take()
+            self.take('}')
+            return value
+
+        if self.peek() == '[':
+            self.take()
+            values: List[Any] = list()
+            while self.peek() != ']':
+                values.append(self.parse_value())
+                if self.peek() == ',':
+                    self.take()
+            self.take(']')
+            return values
+
+        kind, text = self.take()
+        if kind == 'string':
+            return json.loads(text)
+        if kind == 'number':
+            return int(text) if '.' not in text else float(text)
+        return {'true': True, 'false': False, 'null': None}.get(text, text)
+
+
+def get_key(value: Any) -> Any:
+    """
+    Gets the value filters compare, the BigInt fields are sent as strings
+    and related entities are compared by id.
+    """
+    if isinstance(value, dict):
+        value = value.get('id')
+    if isinstance(value, str) and value.lstrip('-').isdigit():
+        return int(value)
+    return value
+
+
+def matches(element: Dict, where: Dict[str, Any]) -> bool:
+    for key, expected in where.items():
+        field, operator = key, ''
+        for o in OPERATORS:
+            if key.endswith(o):
+                field, operator = key[:-len(o)], o
+                break
+
+        # ids are compared as strings, e.g. id_gt: ""
+        convert = str if field == 'id' else get_key
+        value: Any = convert(element.get(field))
+        if operator in ['_in', '_not_in']:
+            found: bool = value in [convert(e) for e in expected]
+            if found != (operator == '_in'):
+                return False
+            continue
+
+        expected = convert(expected)
+        if operator in ['_gt', '_gte', '_lt', '_lte']:
+            if value is None or type(value) != type(expected):
+                value, expected = str(value), str(expected)
+            if not {'_gt': value > expected, '_gte': value >= expected,
+                '_lt': value < expected, '_lte': value <= expected}[operator]:
+                return False
+        elif (value == expected) != (operator == ''):
+            return False
+
+    return True
+
+
+def project(element: Any, fields: List[Field]) -> Any:
+    """
+    Keeps the requested fields of an element, related entities are given
+    as {'id': ...} if they are stored as their id.
+    """
+    if isinstance(element, list):
+        return [project(e, fields) for e in element]
+    if not fields:
+        return element
+    if not isinstance(element, dict):
+        element = {'id': element}
+    return {f.alias: project(element.get(f.name), f.fields) for f in fields}
+
+
+class Subgraph:
+    """
+    In memory subgraph with the entities of a crawl, indexed by id and by
+    DAO to answer the paginated queries of the collectors.
+    """
+    def __init__(self, crawl_dir: str):
+        self.tables: Dict[str, List[Dict]] = dict()
+        self.by_dao: Dict[str, Dict[str, List[Dict]]] = dict()
+        # ids of the elements of each list above, to look up id_gt
+        self.ids: Dict[int, List[str]] = dict()
+
+        for entity, name in ENTITIES.items():
+            path: str = os.path.join(crawl_dir, f'{name}.jsonl')
+            if entity == 'reputationHolders':
+                elements: List[Dict] = self.get_holders()
+            elif os.path.isfile(path):
+                with open(path, 'r') as f:
+                    elements = [dict(DEFAULTS.get(entity, dict()), **json.loads(line))
+                        for line in f if line.strip()]
+            else:
+                elements = list()
+
+            elements.sort(key=lambda e: e['id'])
+            self.tables[entity] = elements
+            groups: Dict[str, List[Dict]] = dict()
+            for e in elements:
+                if 'dao' in e:
+                    groups.setdefault(get_key(e['dao']), list()).append(e)
+            self.by_dao[entity] = groups
+
+            for group in [elements] + list(groups.values()):
+                self.ids[id(group)] = [e['id'] for e in group]
+
+    def get_holders(self) -> List[Dict]:
+        """
+        Gets the reputation holders of each DAO, the users with activity.
+        """
+        holders: Dict[str, Dict] = dict()
+        for entity, user_key in [('proposals', 'proposer'), ('proposalVotes', 'voter'),
+            ('proposalStakes', 'staker')]:
+            for e in self.tables.get(entity, list()):
+                h_id: str = f'{e["dao"]}-{e[user_key]}'
+                holders[h_id] = {'id': h_id, 'address': e[user_key], 'dao': e['dao']}
+
+        return list(holders.values())
+
+    def iter_candidates(self, entity: str, where: Dict[str, Any]) -> Iterator[Dict]:
+        """
+        Gets the elements which may match the filters, in order of id,
+        skipping the ones before id_gt.
+        """
+        elements: List[Dict] = self.tables[entity]
+        if 'dao' in where:
+            elements = self.by_dao[entity].get(get_key(where['dao']), list())
+
+        start: int = 0
+        if where.get('id_gt') is not None:
+            start = bisect.bisect_right(self.ids.get(id(elements), list()), where['id_gt'])
+
+        for i in range(start, len(elements)):
+            yield elements[i]
+
+    def resolve(self, field: Field) -> List[Dict]:
+        if field.name not in self.tables:
+            raise QueryError(f'Type `Query` has no field `{field.name}`')
+
+        first: int = int(field.args.get('first', DEFAULT_FIRST))
+        skip: int = int(field.args.get('skip', 0))
+        if first > MAX_FIRST:
+            raise QueryError(f'The `first` argument must be between 0 and {MAX_FIRST}')
+        if skip > MAX_SKIP:
+            raise QueryError(f'The `skip` argument must be between 0 and {MAX_SKIP}')
+        if field.args.get('orderBy', 'id') != 'id':
+            raise QueryError('Only orderBy: id is supported')
+
+        where: Dict[str, Any] = field.args.get('where', dict())
+        elements: List[Dict] = list()
+        for e in self.iter_candidates(field.name, where):
+            if len(elements) == skip + first:
+                break
+            if matches(e, where):
+                elements.append(e)
+
+        elements = elements[skip:]
+        if field.args.get('orderDirection') == 'desc':
+            elements.reverse()
+
+        return project(elements, field.fields)
+
+    def execute(self, query: str) -> Dict:
+        return {f.alias: self.resolve(f) for f in Parser(query).parse()}
+
+
+class Limiter:
+    """
+    Token bucket of the requests by second the mock serves before it
+    answers HTTP 429, like the hosted endpoint when it throttles.
+    """
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if self.rate <= 0:
+            return True
+
+        with self.lock:
+            now: float = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Answers POST requests with a GraphQL query and GET requests with the
+    stats of the server. Connections are kept alive and responses are
+    compressed if the client accepts gzip, like the hosted endpoint.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self) -> None:
+        self.send_json(200, dict(self.server.stats))
+
+    def do_POST(self) -> None:
+        server = self.server
+        body: bytes = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.count('requests')
+
+        if not server.limiter.allow():
+            self.count('throttled')
+            self.send_json(429, {'errors': [{'message': 'Too many requests'}]},
+                headers={'Retry-After': '1'})
+            return
+
+        if server.latency > 0:
+            time.sleep(random.uniform(0.5, 1.5) * server.latency)
+
+        if random.random() < server.error_rate:
+            self.count('errors')
+            # half of the failures are HTTP errors and half GraphQL errors
+            if random.random() < 0.5:
+                self.send_json(502, {'errors': [{'message': 'Bad gateway'}]})
+            else:
+                self.send_json(200, {'errors': [{'message': 'Store error: timeout'}]})
+            return
+
+        try:
+            query: str = json.loads(body.decode('utf-8'))['query']
+            data: Dict = server.subgraph.execute(query)
+        except (QueryError, ValueError, KeyError) as e:
+            self.count('invalid')
+            self.send_json(200, {'errors': [{'message': str(e)}]})
+            return
+
+        self.count('answered')
+        self.send_json(200, {'data': data})
+
+    def count(self, key: str) -> None:
+        with self.server.lock:
+            self.server.stats[key] += 1
+
+    def send_json(self, code: int, content: Dict, headers: Dict[str, str] = None) -> None:
+        body: bytes = json.dumps(content).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or dict()).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MockServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, subgraph: Subgraph, host: str = HOST, port: int = PORT,
+        latency: float = 0, error_rate: float = 0, rate: float = 0, verbose: bool = False):
+        """
+        Parameters:
+            * subgraph: entities served
+            * latency: mean seconds added to each response, with jitter
+            * error_rate: fraction of the requests which fail
+            * rate: requests by second served before HTTP 429, 0 is unlimited
+        """
+        super().__init__((host, port), Handler)
+        self.subgraph = subgraph
+        self.latency = latency
+        self.error_rate = error_rate
+        self.limiter = Limiter(rate)
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.stats: Dict[str, int] = {k: 0 for k in
+            ['requests', 'answered', 'throttled', 'errors', 'invalid']}
+
+    def get_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/'
+
+
+def make_crawl(rows: int, seed: int = 0) -> str:
+    """
+    Generates a synthetic crawl, see benchmarks/synthetic.py.
+
+    Return:
+        The folder of the crawl.
+    """
+    import synthetic
+
+    crawl_dir: str = tempfile.mkdtemp(prefix='census_subgraph_')
+    synthetic.write_crawl(synthetic.make_datasets(rows, seed=seed), crawl_dir=crawl_dir, seed=seed)
+    return crawl_dir
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Serves a local stand-in of the DAOstack subgraph for the collectors.')
+    parser.add_argument('--crawl', default='',
+        help='folder of a stored crawl to serve, synthetic data by default')
+    parser.add_argument('--rows', type=float, default=float(DEFAULT_ROWS),
+        help=f'activity rows of the synthetic data, {DEFAULT_ROWS} by default')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic data')
+    parser.add_argument('--host', default=HOST, help=f'{HOST} by default')
+    parser.add_argument('--port', type=int, default=PORT, help=f'{PORT} by default')
+    parser.add_argument('--latency', type=float, default=0,
+        help='mean seconds added to each response, 0 by default')
+    parser.add_argument('--error-rate', type=float, default=0,
+        help='fraction of the requests which fail with HTTP 502 or GraphQL errors')
+    parser.add_argument('--rate', type=float, default=0,
+        help='requests by second served before answering HTTP 429, unlimited by default')
+    parser.add_argument('--verbose', action='store_true', help='logs each request')
+    args = parser.parse_args()
+
+    crawl_dir: str = args.crawl or make_crawl(rows=int(args.rows), seed=args.seed)
+    server: MockServer = MockServer(subgraph=Subgraph(crawl_dir), host=args.host, port=args.port,
+        latency=args.latency, error_rate=args.error_rate, rate=args.rate, verbose=args.verbose)
+
+    counts: str = ', '.join(f'{len(v)} {k}' for k, v in server.subgraph.tables.items())
+    print(f'Serving {counts} from {crawl_dir}')
+    print(f'Use CENSUS_ENDPOINT={server.get_url()} or --endpoint {server.get_url()}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f'DONE. {json.dumps(server.stats)}')
@@ -0,0 +1,261 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, NamedTuple
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'collectors'))
+sys.path.append(os.path.join(ROOT, 'ploters'))
+# the crawl is written by the benchmark and it must not be crawled again,
+# nor the datasets be taken from the cache of other runs
+os.environ['CENSUS_CRAWL_MAX_AGE'] = str(10 ** 9)
+os.environ['CENSUS_LOADER_CACHE'] = 'off'
+os.environ['MPLBACKEND'] = 'Agg'
+
+import numpy as np
+import pandas as pd
+import synthetic
+
+OUT_DIR: str = os.path.join('benchmarks', 'results')
+DEFAULT_SIZES: str = '1e3,1e4,1e5'
+MAX_SIZE: int = 10 ** 7
+REPEAT: int = 3
+# slowdown over which a case is flagged by --compare
+THRESHOLD: float = 1.2
+# date the ploters calculate the activity at, so runs are comparable
+AS_OF: date = date(2020, 5, 1)
+
+
+class Case(NamedTuple):
+    name: str
+    group: str
+    function: Callable[[], Any]
+
+
+def get_cases(datasets: Dict[str, pd.DataFrame]) -> List[Case]:
+    """
+    Gets the collector transforms and ploter computations to measure. They
+    run in the directory with the synthetic datawarehouse and crawl.
+    """
+    import crawler
+    import census_collector
+    import proposal_collector
+    import timeserie_collector
+    import activity_plot
+    import boosting_correlation_plot
+    import prediction_rate_plot
+    import time_serie_plot
+    from common import wei
+    from common.addresses import get_book
+    from common.cube import build_cube, read_cube
+    from common.frames import join_df_by_id
+    from common.loader import load
+    from common.sketches import build_sketches, count_distinct, read_sketches
+
+    census_collector.get_daos()
+    daos: pd.DataFrame = proposal_collector.get_daos_id()
+    activity: pd.DataFrame = datasets['activity_serie']
+    coded: pd.DataFrame = activity.copy()
+    for c in ['daoId', 'userId']:
+        coded[c] = get_book().encode(coded[c])
+    amounts: List[str] = [str(a) for a in wei.join(
+        *[datasets['proposals'][c].to_numpy() for c in wei.get_limb_columns('votesFor')])]
+    census: pd.DataFrame = datasets['census']
+    actions: pd.DataFrame = activity.rename(columns={'daoId': 'id'})
+
+    def get_series() -> None:
+        cube: pd.DataFrame = read_cube()
+        for serie in time_serie_plot.SERIES:
+            time_serie_plot.get_serie(cube, serie, approx=False)
+
+    return [
+        Case('crawler.read', 'collectors', lambda: crawler.read('votes')),
+        Case('crawler.read_columns', 'collectors',
+            lambda: crawler.read_columns('votes', {'daoId': 'dao', 'createdAt': 'createdAt'})),
+        Case('census_collector.get_votes', 'collectors', census_collector.get_votes),
+        Case('proposal_collector.get_proposals', 'collectors',
+            lambda: proposal_collector.get_proposals(daos)),
+        Case('timeserie_collector.iter_actions', 'collectors',
+            lambda: sum(len(c) for c in timeserie_collector.iter_actions(daos, dict()))),
+        Case('timeserie_collector.update_watermarks', 'collectors',
+            lambda: timeserie_collector.update_watermarks(dict(), activity)),
+        Case('frames.join_df_by_id', 'collectors',
+            lambda: join_df_by_id(df1=actions, df2=census, keys=['birth', 'nUsers'])),
+        Case('wei.split', 'collectors', lambda: wei.split(amounts)),
+        Case('cube.build_cube', 'collectors', lambda: build_cube(coded)),
+        Case('sketches.build_sketches', 'collectors', lambda: build_sketches(coded)),
+        Case('activity_plot.calculate_month_activity', 'ploters',
+            lambda: activity_plot.calculate_month_activity(as_of=AS_OF)),
+        Case('boosting_correlation_plot.calculate_boost_data', 'ploters',
+            boosting_correlation_plot.calculate_boost_data),
+        Case('prediction_rate_plot.get_prediction_metrics', 'ploters',
+            lambda: prediction_rate_plot.get_prediction_metrics(load('proposals'))),
+        Case('time_serie_plot.get_serie', 'ploters', get_series),
+        Case('sketches.count_distinct', 'ploters',
+            lambda: count_distinct(read_sketches(), by=['month'])),
+    ]
+
+
+def measure(function: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """
+    Times a function, the best of repeat runs, and gets its peak of memory
+    in another run, since tracing the allocations slows it down. The
+    datasets are parsed again in each run.
+    """
+    from common import loader
+
+    times: List[float] = list()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            loader.memo.clear()
+            start: float = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+
+        loader.memo.clear()
+        tracemalloc.start()
+        try:
+            function()
+            peak: int = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {'seconds': min(times), 'runs': times, 'peak_mb': peak / 2 ** 20}
+
+
+def run(sizes: List[int], repeat: int, only: List[str]) -> Dict[str, Any]:
+    """
+    Measures each case with the synthetic datasets of each size.
+
+    Return:
+        The report, with the meta of the run and the results.
+    """
+    import codec
+    from common import addresses
+
+    results: List[Dict[str, Any]] = list()
+    cwd: str = os.getcwd()
+
+    for rows in sizes:
+        work_dir: str = tempfile.mkdtemp(prefix='census_bench_')
+        try:
+            os.chdir(work_dir)
+            # the address book and the memo of other sizes are not valid here
+            addresses.book = None
+
+            start: float = time.perf_counter()
+            datasets: Dict[str, pd.DataFrame] = synthetic.make_datasets(rows)
+            synthetic.write_datasets(datasets)
+            synthetic.write_crawl(datasets, crawl_dir=os.path.join('datawarehouse', 'crawl'))
+            print(f'{rows} rows generated in {time.perf_counter() - start:.2f}s')
+
+            for case in get_cases(datasets):
+                if only and not any(o in case.name for o in only):
+                    continue
+
+                result: Dict[str, Any] = measure(case.function, repeat=repeat)
+                results.append({'case': case.name, 'group': case.group, 'rows': rows, **result})
+                print(f'  {case.name}: {result["seconds"]:.4f}s, {result["peak_mb"]:.1f}MB')
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'orjson': codec.orjson.__version__ if codec.orjson else None,
+            'platform': platform.platform(),
+            'sizes': sizes,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> int:
+    """
+    Prints the ratio new/old of the time and memory of the cases in both
+    reports, flagging the slowdowns over threshold.
+
+    Return:
+        The number of regressions.
+    """
+    before: Dict = {(r['case'], r['rows']): r for r in old['results']}
+    regressions: int = 0
+
+    print(f'{"case":<50} {"rows":>9} {"old s":>9} {"new s":>9} {"time":>7} {"memory":>7}')
+    for r in new['results']:
+        o: Dict = before.get((r['case'], r['rows']))
+        if not o:
+            continue
+
+        time_ratio: float = r['seconds'] / o['seconds'] if o['seconds'] else float('inf')
+        memory_ratio: float = r['peak_mb'] / o['peak_mb'] if o['peak_mb'] else float('inf')
+        flag: str = ''
+        if time_ratio > threshold:
+            regressions += 1
+            flag = ' REGRESSION'
+
+        print(f'{r["case"]:<50} {r["rows"]:>9} {o["seconds"]:>9.4f} {r["seconds"]:>9.4f} '
+            f'{time_ratio:>6.2f}x {memory_ratio:>6.2f}x{flag}')
+
+    return regressions
+
+
+def parse_sizes(text: str) -> List[int]:
+    sizes: List[int] = [int(float(s)) for s in text.split(',') if s]
+    if any(s < 1 or s > MAX_SIZE for s in sizes):
+        raise argparse.ArgumentTypeError(f'sizes must be between 1 and {MAX_SIZE:.0e}')
+    return sizes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmarks the collectors and ploters with synthetic datasets.')
+    parser.add_argument('--sizes', type=parse_sizes, default=parse_sizes(DEFAULT_SIZES),
+        help=f'comma separated activity rows, {DEFAULT_SIZES} by default')
+    parser.add_argument('--repeat', type=int, default=REPEAT,
+        help=f'runs of each case, the best is kept, {REPEAT} by default')
+    parser.add_argument('--only', default='',
+        help='comma separated parts of the names of the cases to run, all by default')
+    parser.add_argument('--out', default='',
+        help=f'path of the JSON report, in {OUT_DIR} by default')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+        help='compares two reports instead of running the benchmark')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+        help=f'slowdown flagged by --compare, {THRESHOLD} by default')
+    args = parser.parse_args()
+
+    if args.compare:
+        reports: List[Dict] = list()
+        for path in args.compare:
+            with open(path, 'r') as f:
+                reports.append(json.load(f))
+
+        regressions: int = compare(*reports, threshold=args.threshold)
+        print(f'DONE. {regressions} regressions over {args.threshold}x')
+        sys.exit(1 if regressions else 0)
+
+    report: Dict[str, Any] = run(sizes=args.sizes, repeat=max(1, args.repeat),
+        only=[o for o in args.only.split(',') if o])
+
+    out: str = args.out or os.path.join(OUT_DIR,
+        f'report-{datetime.now().strftime("%Y%m%d-%H%M%S")}.json')
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    print(f'DONE. Report stored in {out}')
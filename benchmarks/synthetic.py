@@ -0,0 +1,178 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.cube import update_cube
+from common.sketches import update_sketches
+from common.storage import get_path, write_columnar, write_table
+from common.wei import WEI_SCALE, get_limb_columns
+
+# dates of the activity, from April 2019 to April 2020 like the real one
+START_DATE: int = 1554076800
+END_DATE: int = 1587600000
+ACTIONS: List[str] = ['proposal', 'vote', 'stake']
+ACTION_WEIGHTS: List[float] = [0.15, 0.6, 0.25]
+WEI_COLUMNS: List[str] = ['totalRepWhenExecuted', 'votesFor', 'votesAgainst',
+    'stakesFor', 'stakesAgainst']
+
+
+def get_sizes(rows: int) -> Dict[str, int]:
+    """
+    Gets the size of each dataset for a number of activity rows, with the
+    proportions of the real datawarehouse (~8 actions by proposal).
+    """
+    return {
+        'activity': rows,
+        'proposals': max(rows // 8, 10),
+        'daos': max(int(np.sqrt(rows)), 5),
+        'users': max(rows // 20, 10),
+    }
+
+
+def make_ids(n: int, digits: int, offset: int = 0) -> np.ndarray:
+    return np.array([f'0x{i:0{digits}x}' for i in range(offset, offset + n)], dtype=object)
+
+
+def make_datasets(rows: int, seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """
+    Generates the census, proposals and activity_serie datasets, with hex
+    ids and the columns of their schemas.
+
+    Parameters:
+        * rows: number of activity rows
+        * seed: seed of the random generator
+    """
+    sizes: Dict[str, int] = get_sizes(rows)
+    rng = np.random.default_rng(seed)
+
+    dao_ids: np.ndarray = make_ids(sizes['daos'], 40)
+    dao_names: np.ndarray = np.array([f'DAO {i}' for i in range(sizes['daos'])], dtype=object)
+    users: np.ndarray = make_ids(sizes['users'], 40, offset=sizes['daos'])
+    # a few DAOs have most of the activity, like the real ones
+    weights: np.ndarray = 1 / np.arange(1, sizes['daos'] + 1)
+    weights = weights / weights.sum()
+
+    # activity
+    n: int = sizes['activity']
+    daos: np.ndarray = rng.choice(sizes['daos'], size=n, p=weights)
+    activity: pd.DataFrame = pd.DataFrame({
+        'daoId': dao_ids[daos],
+        'daoName': dao_names[daos],
+        'actionType': rng.choice(ACTIONS, size=n, p=ACTION_WEIGHTS),
+        'unixDate': rng.integers(START_DATE, END_DATE, size=n),
+        'userId': users[rng.integers(0, sizes['users'], size=n)],
+    })
+
+    # proposals
+    n = sizes['proposals']
+    daos = rng.choice(sizes['daos'], size=n, p=weights)
+    boosted: np.ndarray = rng.random(n) < 0.65
+    proposals: pd.DataFrame = pd.DataFrame({
+        'daoId': dao_ids[daos],
+        'daoName': dao_names[daos],
+        'proposalId': make_ids(n, 64),
+        'createdAt': rng.integers(START_DATE, END_DATE, size=n),
+    })
+    for c in WEI_COLUMNS:
+        hi, lo = get_limb_columns(c)
+        proposals[hi] = rng.integers(0, 100000, size=n)
+        proposals[lo] = rng.integers(0, WEI_SCALE, size=n)
+    proposals['hasPassed'] = rng.random(n) < 0.75
+    proposals['quorum'] = rng.choice([50, 51, 70], size=n)
+    proposals['boostedAt'] = pd.array(np.where(boosted, proposals['createdAt'] + 3600, 0),
+        dtype='Int64')
+    proposals.loc[~boosted, 'boostedAt'] = pd.NA
+    proposals['differentStakers'] = rng.integers(0, 5, size=n)
+
+    # census
+    counts: Dict[str, np.ndarray] = {
+        action: np.bincount(daos_of, minlength=sizes['daos'])
+        for action, daos_of in [
+            ('proposal', np.searchsorted(dao_ids, proposals['daoId'].to_numpy())),
+            ('vote', np.searchsorted(dao_ids, activity.loc[activity['actionType'] == 'vote',
+                'daoId'].to_numpy())),
+            ('stake', np.searchsorted(dao_ids, activity.loc[activity['actionType'] == 'stake',
+                'daoId'].to_numpy())),
+        ]
+    }
+    census: pd.DataFrame = pd.DataFrame({
+        'id': dao_ids,
+        'name': dao_names,
+        'nUsers': rng.integers(0, 300, size=sizes['daos']),
+        'birth': rng.integers(START_DATE - 90 * 86400, START_DATE, size=sizes['daos']),
+        'nProposals': counts['proposal'],
+        'nVotes': counts['vote'],
+        'nStakes': counts['stake'],
+        'ETH': rng.random(sizes['daos']) * 1000,
+        'GEN': rng.random(sizes['daos']) * 1000,
+        'otherTokens': rng.random(sizes['daos']) * 1000,
+    })
+
+    return {'census': census, 'proposals': proposals, 'activity_serie': activity}
+
+
+def write_datasets(datasets: Dict[str, pd.DataFrame]) -> None:
+    """
+    Stores the datasets like the collectors do, with the activity cube and
+    sketches built from them. It must run in the directory where the
+    'datawarehouse' is.
+    """
+    os.makedirs('datawarehouse', exist_ok=True)
+    write_table(df=datasets['census'], name='census')
+    write_table(df=datasets['proposals'], name='proposals')
+
+    # the activity is streamed to CSV by the collector
+    datasets['activity_serie'].to_csv(get_path('activity_serie', 'csv'), index=False)
+    write_columnar('activity_serie')
+
+    update_cube()
+    update_sketches()
+
+
+def write_crawl(datasets: Dict[str, pd.DataFrame], crawl_dir: str, seed: int = 0) -> None:
+    """
+    Stores a crawl of the endpoint from which the collectors would get the
+    datasets, see collectors/crawler.py.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(crawl_dir, exist_ok=True)
+    census: pd.DataFrame = datasets['census']
+    proposals: pd.DataFrame = datasets['proposals']
+    activity: pd.DataFrame = datasets['activity_serie']
+
+    def write(name: str, lines: List[str]) -> None:
+        with open(os.path.join(crawl_dir, f'{name}.jsonl'), 'w') as f:
+            f.writelines(lines)
+
+    write('daos', [f'{{"id": "{i}", "name": "{n}", "reputationHoldersCount": "{u}"}}\n'
+        for i, n, u in zip(census['id'], census['name'], census['nUsers'])])
+    write('events', [f'{{"id": "ev{k}", "timestamp": "{b}", "dao": {{"id": "{i}"}}}}\n'
+        for k, (i, b) in enumerate(zip(census['id'], census['birth']))])
+
+    users: np.ndarray = activity['userId'].to_numpy()
+    proposers: np.ndarray = users[rng.integers(0, len(users), size=len(proposals.index))]
+    amounts: Dict[str, List[int]] = {c: [int(h) * WEI_SCALE + int(w)
+        for h, w in zip(*[proposals[l] for l in get_limb_columns(c)])] for c in WEI_COLUMNS}
+    lines: List[str] = list()
+    for k, p in enumerate(proposals.itertuples(index=False)):
+        boosted_at: str = 'null' if pd.isna(p.boostedAt) else f'"{p.boostedAt}"'
+        stakers: str = ', '.join(f'{{"staker": "{s}"}}'
+            for s in users[rng.integers(0, len(users), size=p.differentStakers)])
+        lines.append(f'{{"id": "{p.proposalId}", "proposer": "{proposers[k]}", '
+            f'"createdAt": "{p.createdAt}", "executedAt": "{p.createdAt + 7200}", '
+            f'"boostedAt": {boosted_at}, '
+            + ''.join(f'"{c}": "{amounts[c][k]}", ' for c in WEI_COLUMNS) +
+            f'"winningOutcome": "{"Pass" if p.hasPassed else "Fail"}", '
+            f'"stakes": [{stakers}], '
+            f'"genesisProtocolParams": {{"queuedVoteRequiredPercentage": "{p.quorum}"}}, '
+            f'"dao": "{p.daoId}"}}\n')
+    write('proposals', lines)
+
+    for action, name, user_key in [('vote', 'votes', 'voter'), ('stake', 'stakes', 'staker')]:
+        df: pd.DataFrame = activity[activity['actionType'] == action]
+        write(name, [f'{{"id": "{name}{k}", "{user_key}": "{u}", "createdAt": "{t}", '
+            f'"dao": "{d}"}}\n'
+            for k, (d, t, u) in enumerate(zip(df['daoId'], df['unixDate'], df['userId']))])
@@ -0,0 +1,165 @@
+import os
+import re
+import json
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+# orjson is optional, it parses and writes JSON several times faster
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pyarrow is optional, it parses whole JSON lines files into columns
+try:
+    import pyarrow
+    import pyarrow.json
+except ImportError:
+    pyarrow = None
+
+# integer literals which may not fit in 64 bits, orjson parses them as floats
+BIG_INTEGER = re.compile(rb'[:\[,]\s*-?\d{19}')
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Decodes JSON, the integers over 64 bits are kept exact. The subgraph
+    sends its BigInt fields as strings, so those are seldom found.
+    """
+    if orjson:
+        raw: bytes = data.encode('utf-8') if isinstance(data, str) else data
+        if not BIG_INTEGER.search(raw):
+            return orjson.loads(raw)
+
+    return json.loads(data)
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Encodes a value as compact JSON. orjson does not take integers over 64
+    bits, those values are encoded by json.
+    """
+    if orjson:
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            pass
+
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def get_field(element: Any, path: List[str]) -> Any:
+    """
+    Gets a nested field of an element, e.g. ['genesisProtocolParams',
+    'queuedVoteRequiredPercentage']. The fields of a list are got from each
+    of its elements, e.g. ['stakes', 'staker'] gets the list of stakers.
+    """
+    for i, key in enumerate(path):
+        if element is None:
+            return None
+        if isinstance(element, list):
+            return [get_field(e, path[i:]) for e in element]
+        element = element.get(key)
+
+    return element
+
+
+def get_leaf_types(data_type) -> List:
+    """
+    Gets the types of the values of an Arrow type, through its structs
+    and lists.
+    """
+    if pyarrow.types.is_struct(data_type):
+        return [t for f in data_type for t in get_leaf_types(f.type)]
+    if pyarrow.types.is_list(data_type):
+        return get_leaf_types(data_type.value_type)
+    return [data_type]
+
+
+def get_arrow_field(array, path: List[str]) -> Optional[List]:
+    """
+    Gets a nested field of the elements of an Arrow array, without
+    converting the other fields to Python objects. The fields of a list are
+    got from each of its elements, see get_field.
+
+    Return:
+        The values, or None if a struct or list in the path has nulls, which
+        Arrow does not propagate to their fields.
+    """
+    for key in path:
+        if array.null_count:
+            return None
+        if pyarrow.types.is_struct(array.type):
+            array = array.field(array.type.get_field_index(key))
+        elif pyarrow.types.is_list(array.type) and pyarrow.types.is_struct(array.type.value_type):
+            values = array.flatten()
+            if values.null_count:
+                return None
+            array = pyarrow.ListArray.from_arrays(array.offsets,
+                values.field(values.type.get_field_index(key)))
+        else:
+            return None
+
+    return array.to_pylist()
+
+
+class ColumnDecoder:
+    """
+    Decodes JSON elements into a list by field, only the declared fields
+    are kept, so the elements are not kept as dicts while a whole entity is
+    read.
+
+    Parameters:
+        * fields: path of each column, with the nested fields separated by
+            dots, e.g. {'quorum': 'genesisProtocolParams.queuedVoteRequiredPercentage'}
+    """
+    def __init__(self, fields: Dict[str, str]):
+        self.paths: Dict[str, List[str]] = {c: p.split('.') for c, p in fields.items()}
+        self.columns: Dict[str, List] = {c: list() for c in fields}
+
+    def add_lines(self, lines: Iterable[Union[bytes, str]]) -> None:
+        """
+        Decodes JSON lines, one element by line, the blank lines are skipped.
+        """
+        items = list(self.paths.items())
+        columns: Dict[str, List] = self.columns
+
+        for line in lines:
+            if not line.strip():
+                continue
+            element: Dict = loads(line)
+            for c, path in items:
+                columns[c].append(get_field(element, path))
+
+    def add_file(self, path: str) -> None:
+        """
+        Decodes a JSON lines file. With pyarrow it is parsed into Arrow
+        columns and only the declared fields are converted to Python
+        objects. Files with numbers which pyarrow would take as floats, e.g.
+        integers over 64 bits, are decoded line by line.
+        """
+        if pyarrow is None or os.path.getsize(path) == 0:
+            with open(path, 'rb') as f:
+                self.add_lines(f)
+            return
+
+        table = pyarrow.json.read_json(path)
+        names: List[str] = [k[0] for k in self.paths.values() if k[0] in table.column_names]
+        if any(pyarrow.types.is_floating(t) for n in names
+            for t in get_leaf_types(table.schema.field(n).type)):
+            with open(path, 'rb') as f:
+                self.add_lines(f)
+            return
+
+        for c, keys in self.paths.items():
+            if keys[0] not in names:
+                self.columns[c].extend([None] * table.num_rows)
+                continue
+
+            for chunk in table.column(keys[0]).chunks:
+                values: Optional[List] = get_arrow_field(chunk, keys[1:])
+                if values is None:
+                    values = [get_field(e, keys[1:]) for e in chunk.to_pylist()]
+                self.columns[c].extend(values)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), []))
@@ -0,0 +1,316 @@
+import os
+import json
+import time
+import uuid
+import argparse
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+from codec import ColumnDecoder, loads
+from metrics import METRICS_FILE, metrics, save_at_exit
+from requester import ENDPOINT, iter_pages, set_endpoint, stream_by_dao
+from sinks import JsonLinesSink, append_file
+
+CRAWL_DIR: str = os.environ.get('CENSUS_CRAWL_DIR', os.path.join('datawarehouse', 'crawl'))
+# seconds before a crawl is considered outdated and it is requested again
+CRAWL_MAX_AGE: int = int(os.environ.get('CENSUS_CRAWL_MAX_AGE', 12 * 3600))
+# seconds the incremental crawls stay behind the time they start at, so the
+# elements the subgraph has not indexed yet are requested by the next crawl
+CRAWL_LAG: int = int(os.environ.get('CENSUS_CRAWL_LAG', 600))
+
+# queries, they request the union of the fields used by the collectors
+DAO_QUERY: str = '{{daos(where: {{register: "registered", id_gt: "{1}"}}, first: {0}, orderBy: id\
+){{id name reputationHoldersCount}}}}'
+
+EVENT_QUERY: str = '{{events(where: {{type: "NewDAO", id_gt: "{1}"}}, first: {0}, orderBy: id\
+){{id timestamp dao{{id}}}}}}'
+
+PROPOSAL_QUERY: str = '{{proposals(where: {{dao: "{0}", id_gt: "{2}"}}, first: {1}, orderBy: id\
+){{id proposer createdAt executedAt boostedAt totalRepWhenExecuted votesFor votesAgainst stakesFor \
+stakesAgainst winningOutcome stakes{{staker}} genesisProtocolParams{{queuedVoteRequiredPercentage}}}}}}'
+
+VOTE_QUERY: str = '{{proposalVotes(where: {{dao: "{0}", createdAt_gt: "{3}", \
+createdAt_lte: "{4}", id_gt: "{2}"}}, first: {1}, orderBy: id){{id voter createdAt}}}}'
+
+STAKE_QUERY: str = '{{proposalStakes(where: {{dao: "{0}", createdAt_gt: "{3}", \
+createdAt_lte: "{4}", id_gt: "{2}"}}, first: {1}, orderBy: id){{id staker createdAt}}}}'
+
+
+class Entity(NamedTuple):
+    query: str
+    result_key: str
+    # requested DAO by DAO, each element is stored with its DAO id in 'dao'
+    by_dao: bool = False
+    # elements are never modified, so only the ones created after the last
+    # crawl are requested, the query must filter by createdAt_gt and
+    # createdAt_lte, see crawl
+    append_only: bool = False
+
+
+ENTITIES: Dict[str, Entity] = {
+    'daos': Entity(query=DAO_QUERY, result_key='daos'),
+    'events': Entity(query=EVENT_QUERY, result_key='events'),
+    'proposals': Entity(query=PROPOSAL_QUERY, result_key='proposals', by_dao=True),
+    'votes': Entity(query=VOTE_QUERY, result_key='proposalVotes', by_dao=True,
+        append_only=True),
+    'stakes': Entity(query=STAKE_QUERY, result_key='proposalStakes', by_dao=True,
+        append_only=True),
+}
+
+
+def get_path(name: str) -> str:
+    return os.path.join(CRAWL_DIR, f'{name}.jsonl')
+
+
+def iter_elements(name: str, start: int = 0, end: int = None) -> Iterator[Dict]:
+    """
+    Reads a stored crawl element by element, one by line.
+
+    Parameters:
+        * name: key of ENTITIES
+        * start: byte to start reading from, it must be the start of a line
+        * end: byte to stop reading at, the end of the file by default
+    """
+    path: str = get_path(name)
+    if not os.path.isfile(path):
+        return
+
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position: int = start
+        for line in f:
+            position += len(line)
+            if end is not None and position > end:
+                return
+            if line.strip():
+                yield loads(line)
+
+
+def read(name: str) -> List[Dict]:
+    return list(iter_elements(name))
+
+
+def read_columns(name: str, fields: Dict[str, str]) -> Dict[str, List]:
+    """
+    Reads some fields of a stored crawl into a list by field, see
+    codec.ColumnDecoder. It takes less memory than read, since the elements
+    are not kept.
+    """
+    decoder: ColumnDecoder = ColumnDecoder(fields)
+    path: str = get_path(name)
+    if os.path.isfile(path):
+        decoder.add_file(path)
+
+    return decoder.columns
+
+
+def get_state_path(name: str) -> str:
+    return os.path.join(CRAWL_DIR, f'{name}.state.json')
+
+
+def get_watermarks(elements: Iterator[Dict]) -> Dict[str, int]:
+    """
+    Gets the last createdAt stored by DAO. Only used for the crawls stored
+    without a state, see load_state.
+    """
+    watermarks: Dict[str, int] = dict()
+    for e in elements:
+        watermarks[e['dao']] = max(int(e['createdAt']), watermarks.get(e['dao'], 0))
+
+    return watermarks
+
+
+def load_state(name: str) -> Dict:
+    """
+    Gets the state of the stored crawl of an append only entity: its size in
+    bytes, the createdAt it is complete up to by DAO ('watermarks') and the
+    id of the file it was appended to ('generation'), which changes when
+    the crawl is stored again from scratch. The bytes after the size were
+    appended by a crawl which did not finish.
+    """
+    path: str = get_path(name)
+    state_path: str = get_state_path(name)
+    if not os.path.isfile(path):
+        return {'size': 0, 'watermarks': dict(), 'generation': uuid.uuid4().hex}
+
+    if not os.path.isfile(state_path):
+        # stored before the states were kept
+        return {'size': os.path.getsize(path), 'watermarks': get_watermarks(iter_elements(name)),
+            'generation': uuid.uuid4().hex}
+
+    with open(state_path, 'r') as f:
+        state: Dict = json.load(f)
+
+    state.setdefault('generation', uuid.uuid4().hex)
+    return state
+
+
+def save_state(name: str, state: Dict) -> None:
+    path: str = get_state_path(name)
+    tmp_path: str = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def crawl(name: str, dao_ids: List[str] = None) -> int:
+    """
+    Requests an entity and stores it in CRAWL_DIR. The chunks are written as
+    they arrive to a '.part' file, which replaces the stored crawl (or it is
+    appended to it if the entity is append only) once the crawl finishes.
+
+    The append only entities are requested from the createdAt the stored
+    crawl is complete up to, until CRAWL_LAG seconds before the crawl
+    starts, which is kept as the watermark of each requested DAO. Their
+    responses are not cached, a cached page could skip elements.
+
+    Parameters:
+        * name: key of ENTITIES
+        * dao_ids: DAOs to request, only used by entities requested by DAO
+    Return:
+        The number of elements requested.
+    """
+    entity: Entity = ENTITIES[name]
+    print(f'Crawling {name} ...')
+    start: datetime = datetime.now()
+
+    path: str = get_path(name)
+    part_path: str = f'{path}.part'
+
+    with JsonLinesSink(path=part_path) as sink:
+        if not entity.by_dao:
+            for chunk in iter_pages(query=entity.query, result_key=entity.result_key):
+                sink.write(chunk)
+        elif not entity.append_only:
+            stream_by_dao(
+                query=entity.query,
+                result_key=entity.result_key,
+                dao_ids=dao_ids,
+                sink=lambda d_id, chunk: sink.write([dict(e, dao=d_id) for e in chunk]))
+        else:
+            state: Dict = load_state(name)
+            watermarks: Dict[str, int] = state['watermarks']
+            # the elements of a crawl which did not finish are requested again
+            if os.path.isfile(path) and os.path.getsize(path) > state['size']:
+                with open(path, 'r+b') as f:
+                    f.truncate(state['size'])
+            upper: int = int(time.time()) - CRAWL_LAG
+
+            stream_by_dao(
+                query=entity.query,
+                result_key=entity.result_key,
+                dao_ids=dao_ids,
+                sink=lambda d_id, chunk: sink.write([dict(e, dao=d_id) for e in chunk]),
+                params={d_id: (watermarks.get(d_id, 0), upper) for d_id in dao_ids},
+                cache=False)
+
+    if entity.append_only:
+        # a state to roll back to if the append does not finish
+        if not os.path.isfile(get_state_path(name)):
+            save_state(name, state)
+        append_file(src=part_path, dst=path)
+        # the watermarks of the DAOs which were not requested are kept
+        for d_id in dao_ids:
+            watermarks[d_id] = max(upper, watermarks.get(d_id, 0))
+        save_state(name, {'size': os.path.getsize(path), 'watermarks': watermarks,
+            'generation': state['generation']})
+    else:
+        os.replace(part_path, path)
+
+    print(f'{sink.rows} {"new " if entity.append_only else ""}{name} crawled in '
+        f'{(datetime.now() - start).total_seconds():.2f}s: '
+        f'{metrics.get_summary(entity.result_key)}')
+    return sink.rows
+
+
+def ensure_crawled(name: str, dao_ids: List[str] = None) -> None:
+    """
+    Crawls an entity if it has not been crawled yet or the crawl is older
+    than CRAWL_MAX_AGE.
+    """
+    path: str = get_path(name)
+    if os.path.isfile(path) and time.time() - os.path.getmtime(path) <= CRAWL_MAX_AGE:
+        return
+
+    if ENTITIES[name].by_dao and dao_ids is None:
+        dao_ids = [d['id'] for d in load('daos')]
+
+    crawl(name=name, dao_ids=dao_ids)
+
+
+def load(name: str, dao_ids: List[str] = None) -> List[Dict]:
+    """
+    Gets an entity from the stored crawl, see ensure_crawled.
+    """
+    ensure_crawled(name=name, dao_ids=dao_ids)
+    return read(name)
+
+
+def load_columns(name: str, fields: Dict[str, str], dao_ids: List[str] = None) -> Dict[str, List]:
+    """
+    Gets some fields of an entity from the stored crawl, see ensure_crawled
+    and read_columns.
+    """
+    ensure_crawled(name=name, dao_ids=dao_ids)
+    return read_columns(name=name, fields=fields)
+
+
+def iter_load(name: str, dao_ids: List[str] = None) -> Iterator[Dict]:
+    """
+    Gets an entity from the stored crawl element by element, see
+    ensure_crawled.
+    """
+    ensure_crawled(name=name, dao_ids=dao_ids)
+    return iter_elements(name)
+
+
+def iter_load_after(name: str, mark: Dict, dao_ids: List[str] = None)\
+-> Tuple[Iterator[Dict], Dict]:
+    """
+    Gets the elements of an append only entity stored after a mark, see
+    ensure_crawled. The whole crawl is read if the mark is empty or it was
+    taken from another generation of the crawl.
+
+    Parameters:
+        * name: key of ENTITIES
+        * mark: {'generation', 'size'} of the crawl when it was read before
+        * dao_ids: DAOs to request if the entity is crawled
+    Return:
+        The elements and the mark to read the next ones after.
+    """
+    ensure_crawled(name=name, dao_ids=dao_ids)
+    if not os.path.isfile(get_state_path(name)):
+        # stored before the states were kept
+        return iter_elements(name), dict()
+
+    state: Dict = load_state(name)
+    start: int = 0
+    if mark.get('generation') == state['generation'] and mark.get('size', 0) <= state['size']:
+        start = mark['size']
+
+    elements: Iterator[Dict] = iter_elements(name, start=start, end=state['size'])
+    return elements, {'generation': state['generation'], 'size': state['size']}
+
+
+def crawl_all() -> None:
+    crawl('daos')
+    dao_ids: List[str] = [d['id'] for d in read('daos')]
+
+    crawl('events')
+    for name in ['proposals', 'votes', 'stakes']:
+        crawl(name=name, dao_ids=dao_ids)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Crawls the entities used by the collectors.')
+    parser.add_argument('--endpoint', default=ENDPOINT,
+        help='GraphQL endpoint, CENSUS_ENDPOINT or the DAOstack subgraph by default')
+    parser.add_argument('--metrics', default='',
+        help='stores the metrics of the requests, as a Prometheus textfile if it ends '
+        'with .prom and as JSON otherwise')
+    args = parser.parse_args()
+
+    set_endpoint(args.endpoint)
+    if args.metrics and args.metrics != METRICS_FILE:
+        save_at_exit(args.metrics)
+    crawl_all()
+    print(f'DONE. Crawl stored in {CRAWL_DIR}')
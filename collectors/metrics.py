@@ -0,0 +1,200 @@
+import os
+import json
+import atexit
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# path the metrics are exported to when the process ends, as a Prometheus
+# textfile if it ends with '.prom' and as JSON otherwise
+METRICS_FILE: str = os.environ.get('CENSUS_METRICS', '')
+PROMETHEUS: str = '.prom'
+# upper bounds of the latency buckets, in seconds
+BUCKETS: List[float] = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+# counters by entity
+COUNTERS: List[str] = ['requests', 'cache_hits', 'retries', 'throttled', 'failures', 'bytes',
+    'received_bytes', 'pages', 'elements']
+
+
+class Histogram:
+    """
+    Latency histogram with the buckets of BUCKETS, each bucket counts the
+    observations less or equal than its bound.
+    """
+    def __init__(self):
+        self.counts: List[int] = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            'buckets': {str(b): c for b, c in zip(BUCKETS, self.counts)},
+            'sum': self.sum,
+            'count': self.count,
+        }
+
+
+class Metrics:
+    """
+    Metrics of the requests to the endpoint: latency, bytes, retries and
+    cache hits by entity, and pages and elements by entity and DAO. It holds
+    a lock, so the request threads can share it.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters: Dict[str, Counter] = dict()
+            self.latency: Dict[str, Histogram] = dict()
+            self.by_dao: Dict[Tuple[str, str], Counter] = dict()
+
+    def count(self, entity: str, key: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters.setdefault(entity, Counter())[key] += value
+
+    def observe_request(self, entity: str, seconds: float, size: int, received: int = None) -> None:
+        """
+        Records a request answered by the endpoint.
+
+        Parameters:
+            * entity: first entity of the query, e.g. 'proposals'
+            * seconds: latency of the request
+            * size: bytes of the response
+            * received: bytes received, less than size if it was compressed
+        """
+        with self.lock:
+            counter: Counter = self.counters.setdefault(entity, Counter())
+            counter['requests'] += 1
+            counter['bytes'] += size
+            counter['received_bytes'] += size if received is None else received
+            self.latency.setdefault(entity, Histogram()).observe(seconds)
+
+    def observe_page(self, entity: str, dao_id: str, elements: int) -> None:
+        """
+        Records a page of elements, of a DAO if dao_id is not empty.
+        """
+        with self.lock:
+            counter: Counter = self.counters.setdefault(entity, Counter())
+            counter['pages'] += 1
+            counter['elements'] += elements
+            if dao_id:
+                dao: Counter = self.by_dao.setdefault((entity, dao_id), Counter())
+                dao['pages'] += 1
+                dao['elements'] += elements
+
+    def get_top_daos(self, entity: str, n: int = 10) -> List[Tuple[str, int]]:
+        """
+        Gets the DAOs with more elements of an entity.
+
+        Return:
+            A list of (dao_id, elements), most elements first.
+        """
+        with self.lock:
+            daos: List[Tuple[str, int]] = [(d_id, c['elements'])
+                for (e, d_id), c in self.by_dao.items() if e == entity]
+
+        return sorted(daos, key=lambda d: -d[1])[:n]
+
+    def get_summary(self, entity: str) -> str:
+        """
+        Gets a line with the totals of an entity, e.g. to print after a crawl.
+        """
+        with self.lock:
+            counter: Counter = self.counters.get(entity, Counter())
+            histogram: Histogram = self.latency.get(entity, Histogram())
+
+        mean: float = histogram.sum / histogram.count if histogram.count else 0
+        return (f'{counter["requests"]} requests ({counter["cache_hits"]} cached), '
+            f'{counter["pages"]} pages, {counter["bytes"] / 2 ** 20:.2f}MB '
+            f'({counter["received_bytes"] / 2 ** 20:.2f}MB received), '
+            f'{counter["retries"]} retries, {mean:.3f}s mean latency')
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            return {
+                'entities': {e: {
+                    **{k: c[k] for k in COUNTERS},
+                    'latency': self.latency[e].to_dict() if e in self.latency else None,
+                } for e, c in self.counters.items()},
+                'daos': [{'entity': e, 'dao': d_id, 'pages': c['pages'], 'elements': c['elements']}
+                    for (e, d_id), c in sorted(self.by_dao.items())],
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Gets the metrics in the Prometheus text format, e.g. for the textfile
+        collector of the node exporter.
+        """
+        lines: List[str] = list()
+        metrics: Dict = self.to_dict()
+        entities: Dict[str, Dict] = metrics['entities']
+
+        lines += ['# HELP census_request_seconds Latency of the requests to the endpoint.',
+            '# TYPE census_request_seconds histogram']
+        for e, values in entities.items():
+            latency: Dict = values['latency']
+            if not latency:
+                continue
+            for bound, count in latency['buckets'].items():
+                lines.append(f'census_request_seconds_bucket{{entity="{e}",le="{bound}"}} {count}')
+            lines.append(f'census_request_seconds_bucket{{entity="{e}",le="+Inf"}} '
+                f'{latency["count"]}')
+            lines.append(f'census_request_seconds_sum{{entity="{e}"}} {latency["sum"]}')
+            lines.append(f'census_request_seconds_count{{entity="{e}"}} {latency["count"]}')
+
+        for key in COUNTERS:
+            name: str = f'census_{"response_bytes" if key == "bytes" else key}_total'
+            lines += [f'# TYPE {name} counter']
+            lines += [f'{name}{{entity="{e}"}} {values[key]}' for e, values in entities.items()]
+
+        for key in ['pages', 'elements']:
+            name: str = f'census_dao_{key}_total'
+            lines += [f'# TYPE {name} counter']
+            lines += [f'{name}{{entity="{d["entity"]}",dao="{d["dao"]}"}} {d[key]}'
+                for d in metrics['daos']]
+
+        return '\n'.join(lines) + '\n'
+
+    def save(self, path: str) -> None:
+        """
+        Writes the metrics as a Prometheus textfile if path ends with '.prom'
+        and as JSON otherwise.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path: str = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            if path.endswith(PROMETHEUS):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), f, indent=1)
+        # the textfile collector must never read a partial file
+        os.replace(tmp_path, path)
+
+
+metrics: Metrics = Metrics()
+
+
+def save_if_recorded(path: str) -> None:
+    """
+    Saves the metrics unless nothing was recorded, so a process which did
+    not request anything does not overwrite the metrics of the one before.
+    """
+    if metrics.counters:
+        metrics.save(path)
+
+
+def save_at_exit(path: str) -> None:
+    atexit.register(save_if_recorded, path)
+
+
+if METRICS_FILE:
+    save_at_exit(METRICS_FILE)
@@ -1,62 +1,74 @@
 import os
+import sys
 import pandas as pd
 from typing import Dict, List
-from datetime import datetime
-from requester import n_requests
-
-DAO_QUERY: str = '{{daos(where: {{register: "registered"}}, first: {0}, skip: {1}\
-){{id name}}}}'
-
-PROPOSAL_QUERY: str = '{{proposals(where: {{dao: "{0}", executedAt_not: null}}, first: {1}, skip: {2}\
-){{id createdAt boostedAt totalRepWhenExecuted votesFor votesAgainst stakesFor stakesAgainst winningOutcome \
-stakes{{staker}} genesisProtocolParams{{queuedVoteRequiredPercentage}}}}}}'
+import crawler
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.storage import write_table
+from common.wei import get_limb_columns, split
+
+WEI_COLUMNS: List[str] = ['totalRepWhenExecuted', 'votesFor', 'votesAgainst',
+    'stakesFor', 'stakesAgainst']
+COLUMNS: List[str] = ['daoId', 'daoName', 'proposalId', 'createdAt', 'totalRepWhenExecuted',
+    'votesFor', 'votesAgainst', 'hasPassed', 'quorum', 'boostedAt', 'stakesFor', 'stakesAgainst',
+    'differentStakers']
+# column and field of the crawled proposals
+PROPOSAL_FIELDS: Dict[str, str] = {
+    'daoId': 'dao',
+    'proposalId': 'id',
+    'createdAt': 'createdAt',
+    'executedAt': 'executedAt',
+    'totalRepWhenExecuted': 'totalRepWhenExecuted',
+    'votesFor': 'votesFor',
+    'votesAgainst': 'votesAgainst',
+    'winningOutcome': 'winningOutcome',
+    # unwrap vote percentage
+    'quorum': 'genesisProtocolParams.queuedVoteRequiredPercentage',
+    'boostedAt': 'boostedAt',
+    'stakesFor': 'stakesFor',
+    'stakesAgainst': 'stakesAgainst',
+    'stakers': 'stakes.staker',
+}
 
 
 def get_daos_id() -> pd.DataFrame:
-    print("Requesting DAO ids ...")
-    start: datetime = datetime.now()
-
-    daos: List[Dict] = n_requests(query=DAO_QUERY, result_key='daos')
+    daos: List[Dict] = crawler.load('daos')
 
-    print(f'DAO ids requested in {round((datetime.now() - start).total_seconds(), 2)}s')
-
-    return pd.DataFrame(daos)
+    return pd.DataFrame(daos)[['id', 'name']]
 
 
 def get_proposals(daos: pd.DataFrame) -> pd.DataFrame:
-    df: pd.DataFrame = pd.DataFrame()
-
-    print("Requesting proposals ...")
-    start: datetime = datetime.now()
-
-    for _, row in daos.iterrows():
-        proposals: List[Dict] = n_requests(query=PROPOSAL_QUERY, 
-            result_key='proposals', dao_id=row['id'])
+    """
+    Gets the executed proposals of the DAOs, in the order of daos. The crawl
+    is read straight into columns, see crawler.load_columns.
+    """
+    columns: Dict[str, List] = crawler.load_columns(name='proposals',
+        fields=PROPOSAL_FIELDS, dao_ids=daos['id'].tolist())
 
-        # add dict parameter as just parameter
-        for p in proposals:
-            # calculate diferent stakers
-            p['differentStakers'] = len(set([x['staker'] for x in p['stakes']]))
-            del p['stakes']
+    df: pd.DataFrame = pd.DataFrame(columns, columns=list(PROPOSAL_FIELDS))
+    positions: pd.Series = pd.Series(range(len(daos.index)), index=daos['id'].to_numpy())
+    df['position'] = df['daoId'].map(positions)
 
-            # unwrap vote percentage
-            p['quorum'] = p['genesisProtocolParams']['queuedVoteRequiredPercentage']
-            del p['genesisProtocolParams']
+    # only executed proposals of the DAOs
+    df = df[df['executedAt'].notna() & df['position'].notna()]
+    df = df.sort_values(by='position', kind='mergesort')
 
-        dff: pd.DataFrame = pd.DataFrame(proposals)
-        dff = dff.rename(columns={'id': 'proposalId', 'winningOutcome': 'hasPassed'})
-        dff['daoId'] = row['id']
-        dff['daoName'] = row['name']
-        df = df.append(dff, ignore_index=True)
+    df['daoName'] = daos['name'].to_numpy()[df['position'].astype('int64').to_numpy()]
+    df['createdAt'] = df['createdAt'].astype('int64')
+    df['hasPassed'] = df['winningOutcome'] == 'Pass'
+    # calculate diferent stakers
+    df['differentStakers'] = pd.Series([len(set(s or [])) for s in df['stakers']],
+        index=df.index, dtype='int64')
 
-    print(f'Proposals requested in {round((datetime.now() - start).total_seconds(), 2)}s')
+    df = df[COLUMNS].reset_index(drop=True)
 
-    # data transformation 
-    df['hasPassed'] = df['hasPassed'].apply(lambda x: True if x == 'Pass' else False)
-    df['createdAt'] = df['createdAt'].apply(lambda x: int(x))
-    df['differentStakers'] = df['differentStakers'].apply(lambda x: int(x))
+    # wei amounts to exact int64 limbs, once for all the proposals
+    for c in WEI_COLUMNS:
+        hi, lo = get_limb_columns(c)
+        df[hi], df[lo] = split(df[c])
 
-    return df
+    return df.drop(columns=WEI_COLUMNS)
 
 
 if __name__ == '__main__':
@@ -70,16 +82,15 @@ if __name__ == '__main__':
         'daoName', 
         'proposalId', 
         'createdAt', 
-        'totalRepWhenExecuted', 
-        'votesFor',
-        'votesAgainst',
+        *get_limb_columns('totalRepWhenExecuted'),
+        *get_limb_columns('votesFor'),
+        *get_limb_columns('votesAgainst'),
         'hasPassed',
         'quorum',
         'boostedAt',
-        'stakesFor',
-        'stakesAgainst',
+        *get_limb_columns('stakesFor'),
+        *get_limb_columns('stakesAgainst'),
         'differentStakers']]
 
-    out_file: str = os.path.join('datawarehouse', 'proposals.csv')
-    df.to_csv(out_file, index=False)
-    print(f'DONE. Data stored in {out_file}')
\ No newline at end of file
+    write_table(df=df, name='proposals')
+    print(f'DONE. Data stored in {os.path.join("datawarehouse", "proposals.csv")}')
\ No newline at end of file
@@ -1,48 +1,370 @@
-import json
-from graphqlclient import GraphQLClient
-from typing import Dict, List
+import os
+import time
+import random
+import zlib
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+import response_cache
+from codec import dumps, loads
+from metrics import metrics
+from transport import HTTPStatusError, HttpTransport
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 
 ELEMS_PER_CHUNK: int = 1000
+# pagination modes: 'cursor' pages with id_gt the last id received, 'skip'
+# pages with the number of elements received (slow and capped at 5000)
+CURSOR: str = 'cursor'
+SKIP: str = 'skip'
+# number of requests in flight at the same time
+MAX_WORKERS: int = int(os.environ.get('CENSUS_WORKERS', 8))
+# number of DAOs packed in the same request
+BATCH_SIZE: int = int(os.environ.get('CENSUS_BATCH', 20))
+# requests by second, the rate goes down when the endpoint throttles us and
+# goes up again while it answers
+RATE: float = float(os.environ.get('CENSUS_RATE', 10))
+MIN_RATE: float = 0.5
+MAX_RATE: float = float(os.environ.get('CENSUS_MAX_RATE', 50))
+# retries of each query before giving up
+MAX_RETRIES: int = int(os.environ.get('CENSUS_RETRIES', 6))
+BACKOFF_BASE: float = 1.0
+BACKOFF_MAX: float = 60.0
 DAOSTACK_URL: str = 'https://api.thegraph.com/subgraphs/name/daostack/master'
-client: GraphQLClient = GraphQLClient(DAOSTACK_URL)
+# endpoint requested, e.g. a local subgraph (see benchmarks/mock_subgraph.py)
+ENDPOINT: str = os.environ.get('CENSUS_ENDPOINT', DAOSTACK_URL)
+transport: HttpTransport = HttpTransport(ENDPOINT)
 
 
-def request(query: str) -> Dict:
+class RequestError(Exception):
     """
-    Requests data from endpoint.
+    Raised when a query keeps failing after all its retries.
     """
-    result = client.execute(query)
-    result = json.loads(result)
-    return result['data'] if 'data' in result else dict()
 
 
-def n_requests(query: str, result_key: str, dao_id: str = '') -> List[Dict]:
+class RetryableError(Exception):
     """
-    Requests all chunks from endpoint.
+    Failure which is worth retrying, e.g. HTTP 429, 5xx or GraphQL errors.
+    """
+    def __init__(self, message: str, throttled: bool = False,
+        retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.throttled = throttled
+        self.retry_after = retry_after
 
-    Parameters:
-        * query: json to request
-        * result_key 
-        * dao_id
+
+class TokenBucket:
     """
-    elements: List[Dict] = list()
-    chunk: int = 0
-    result = Dict
+    Token bucket which adapts its rate to the endpoint: it halves the rate
+    when the endpoint throttles and increases it slowly after each success.
+    """
+    def __init__(self, rate: float, capacity: float, min_rate: float = MIN_RATE,
+        max_rate: float = MAX_RATE):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Waits until there is a token and takes it.
+        """
+        while True:
+            with self.lock:
+                now: float = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait: float = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + 1 / self.rate)
+
+    def on_throttle(self) -> None:
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+
+bucket: TokenBucket = TokenBucket(rate=RATE, capacity=max(1, MAX_WORKERS))
+
+
+def set_endpoint(url: str) -> None:
+    """
+    Requests another endpoint from now on, instead of CENSUS_ENDPOINT.
+    """
+    global ENDPOINT, transport
+    transport.close()
+    ENDPOINT = url
+    transport = HttpTransport(url)
+
+
+def get_cache_scope() -> str:
+    """
+    Gets the scope of the cached responses, so the responses of other
+    endpoints are never mixed up with the ones of the subgraph.
+    """
+    return '' if ENDPOINT == DAOSTACK_URL else ENDPOINT
+
+
+def get_backoff(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Exponential backoff with full jitter, it never waits less than the
+    Retry-After sent by the endpoint.
+    """
+    delay: float = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    return max(delay, retry_after) if retry_after else delay
+
+
+def execute(query: str) -> Dict:
+    """
+    Sends the query once, raising RetryableError on transient failures.
+    """
+    start: float = time.perf_counter()
+    try:
+        result, received = transport.post(dumps({'query': query, 'variables': {}}))
+    except HTTPStatusError as e:
+        if e.code == 429 or e.code >= 500:
+            retry_after: Optional[str] = e.headers.get('Retry-After')
+            raise RetryableError(f'HTTP {e.code}', throttled=e.code == 429,
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+        raise
+    except (OSError, http.client.HTTPException, zlib.error) as e:
+        # network errors and timeouts, or broken responses
+        raise RetryableError(f'{type(e).__name__}: {e}')
+
+    metrics.observe_request(entity=response_cache.get_entity(query),
+        seconds=time.perf_counter() - start, size=len(result), received=received)
+
+    result = loads(result)
+    if 'errors' in result:
+        raise RetryableError(f'GraphQL errors: {result["errors"]}')
+
+    return result
+
+
+def request(query: str, cache: bool = True) -> Dict:
+    """
+    Requests data from endpoint, the responses are cached on disk (see
+    response_cache) unless cache is False. Requests are paced by the token
+    bucket and failures are retried with backoff up to MAX_RETRIES times,
+    then RequestError is raised.
+    """
+    scope: str = get_cache_scope()
+    entity: str = response_cache.get_entity(query)
+    cached: Dict = response_cache.get(query, scope=scope) if cache else None
+    if cached is not None:
+        metrics.count(entity, 'cache_hits')
+        return cached
+
+    attempt: int = 0
+    while True:
+        bucket.acquire()
+        try:
+            result: Dict = execute(query)
+            break
+        except RetryableError as e:
+            if e.throttled:
+                bucket.on_throttle()
+                metrics.count(entity, 'throttled')
+            if attempt >= MAX_RETRIES:
+                metrics.count(entity, 'failures')
+                raise RequestError(f'{e} after {attempt} retries') from e
+
+            delay: float = get_backoff(attempt=attempt, retry_after=e.retry_after)
+            print(f'{e}: retrying in {delay:.2f}s')
+            metrics.count(entity, 'retries')
+            time.sleep(delay)
+            attempt += 1
+
+    bucket.on_success()
+
+    if 'data' not in result:
+        return dict()
+
+    if cache:
+        response_cache.put(query, result['data'], scope=scope)
+    return result['data']
+
+
+def iter_pages(query: str, result_key: str, dao_id: str = '',
+    pagination: str = CURSOR, after: str = '', params: Tuple = (),
+    cache: bool = True) -> Iterator[List[Dict]]:
+    """
+    Requests all chunks from endpoint, yielding each chunk as soon as it
+    arrives. See n_requests for the parameters.
+    """
+    last_id: str = after
+    received: int = 0
     condition: bool = True
 
     while condition:
+        offset = last_id if pagination == CURSOR else received
+
         if dao_id:
-            query_filled: str = query.format(dao_id, ELEMS_PER_CHUNK, len(elements))
+            query_filled: str = query.format(dao_id, ELEMS_PER_CHUNK, offset, *params)
         else:
-            query_filled: str = query.format(ELEMS_PER_CHUNK, len(elements))
+            query_filled: str = query.format(ELEMS_PER_CHUNK, offset, *params)
 
-        result = request(query=query_filled)
-        result = result[result_key]
+        result: List[Dict] = request(query=query_filled, cache=cache)[result_key]
+        metrics.observe_page(entity=result_key, dao_id=dao_id, elements=len(result))
+        if result:
+            yield result
 
-        elements.extend(result)
+        received += len(result)
+        if result and pagination == CURSOR:
+            last_id = result[-1]['id']
 
         condition = len(result) == ELEMS_PER_CHUNK
-        chunk += 1
+
+
+def n_requests(query: str, result_key: str, dao_id: str = '',
+    pagination: str = CURSOR, after: str = '', params: Tuple = (),
+    cache: bool = True) -> List[Dict]:
+    """
+    Requests all chunks from endpoint.
+
+    Parameters:
+        * query: json to request
+        * result_key
+        * dao_id
+        * pagination: CURSOR fills the query with the id of the last element
+            received, so the query must filter by id_gt, be ordered by id and
+            request the id field. SKIP fills it with the number of elements
+            received.
+        * after: id to start from when pagination is CURSOR
+        * params: extra values to fill the query with, after the offset
+        * cache: use the response cache, see request
+    """
+    elements: List[Dict] = list()
+    for chunk in iter_pages(query=query, result_key=result_key, dao_id=dao_id,
+        pagination=pagination, after=after, params=params, cache=cache):
+        elements.extend(chunk)
+
+    return elements
+
+
+def batch_request(query: str, result_key: str, dao_ids: List[str], sink: Callable,
+    params: Dict[str, Tuple] = None, cache: bool = True) -> None:
+    """
+    Requests the first chunk of several DAOs in a single query, each DAO is
+    requested under its own alias (d0, d1, ...). DAOs with a full chunk go on
+    paginating on their own.
+
+    Parameters:
+        * query: json to request, it must be filled with the dao id and use
+            CURSOR pagination
+        * result_key
+        * dao_ids: DAOs to request
+        * sink: function called as sink(dao_id, chunk) with each chunk
+        * params: extra values to fill the query of each DAO with
+        * cache: use the response cache, see request
+    """
+    params = params if params else dict()
+    # remove the braces of each query to nest it under an alias
+    fields: List[str] = [
+        f'd{i}: ' + query.format(d_id, ELEMS_PER_CHUNK, '', *params.get(d_id, ()))[1:-1]
+        for i, d_id in enumerate(dao_ids)]
+
+    result: Dict = request(query='{' + ' '.join(fields) + '}', cache=cache)
+
+    for i, d_id in enumerate(dao_ids):
+        chunk: List[Dict] = result[f'd{i}']
+        metrics.observe_page(entity=result_key, dao_id=d_id, elements=len(chunk))
+        if chunk:
+            sink(d_id, chunk)
+        if len(chunk) == ELEMS_PER_CHUNK:
+            for page in iter_pages(query=query, result_key=result_key, dao_id=d_id,
+                after=chunk[-1]['id'], params=params.get(d_id, ()), cache=cache):
+                sink(d_id, page)
+
+
+def fan_out(fn: Callable, items: List, workers: int = MAX_WORKERS) -> Dict:
+    """
+    Calls fn(item) for every item using a pool of threads.
+
+    Parameters:
+        * fn: function which requests the data of one item, e.g. a DAO
+        * items: items to request, they must be hashable
+        * workers: max number of requests in flight
+    Return:
+        A dict {item: fn(item)} which keeps the order of items.
+    """
+    if workers <= 1:
+        return {i: fn(i) for i in items}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures: Dict = {i: executor.submit(fn, i) for i in items}
+        return {i: f.result() for i, f in futures.items()}
+
+
+def stream_by_dao(query: str, result_key: str, dao_ids: List[str], sink: Callable,
+    workers: int = MAX_WORKERS, batch_size: int = BATCH_SIZE,
+    params: Dict[str, Tuple] = None, cache: bool = True) -> None:
+    """
+    Requests all chunks of every DAO concurrently, packing batch_size DAOs in
+    each request, and passes each chunk to the sink as soon as it arrives.
+
+    Parameters:
+        * query: json to request, it must be filled with the dao id
+        * result_key
+        * dao_ids: DAOs to request
+        * sink: function called as sink(dao_id, chunk) with each chunk. It is
+            called from several threads, but the chunks of a DAO always come
+            in order from the same thread.
+        * workers: max number of requests in flight
+        * batch_size: DAOs by request, use 1 to request each DAO on its own
+        * params: extra values to fill the query of each DAO with
+        * cache: use the response cache, see request. Queries which depend on
+            the time of the crawl must not be answered from it.
+    """
+    params = params if params else dict()
+
+    def stream_dao(d_id: str) -> None:
+        for page in iter_pages(query=query, result_key=result_key, dao_id=d_id,
+            params=params.get(d_id, ()), cache=cache):
+            sink(d_id, page)
+
+    if batch_size <= 1:
+        fan_out(fn=stream_dao, items=dao_ids, workers=workers)
+        return
+
+    batches: List = [tuple(dao_ids[i:i + batch_size])
+        for i in range(0, len(dao_ids), batch_size)]
+
+    fan_out(
+        fn=lambda batch: batch_request(query=query, result_key=result_key,
+            dao_ids=list(batch), sink=sink, params=params, cache=cache),
+        items=batches,
+        workers=workers)
+
+
+def n_requests_by_dao(query: str, result_key: str, dao_ids: List[str],
+    workers: int = MAX_WORKERS, batch_size: int = BATCH_SIZE,
+    params: Dict[str, Tuple] = None) -> Dict[str, List[Dict]]:
+    """
+    Requests all chunks of every DAO concurrently, see stream_by_dao.
+
+    Return:
+        A dict {dao_id: elements} which keeps the order of dao_ids.
+    """
+    elements: Dict[str, List[Dict]] = {d_id: list() for d_id in dao_ids}
+
+    stream_by_dao(
+        query=query,
+        result_key=result_key,
+        dao_ids=dao_ids,
+        sink=lambda d_id, chunk: elements[d_id].extend(chunk),
+        workers=workers,
+        batch_size=batch_size,
+        params=params)
 
     return elements
@@ -0,0 +1,168 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+CACHE_DIR: str = os.environ.get('CENSUS_CACHE_DIR', '.census_cache')
+# 'on' reads and writes the cache, 'off' ignores it and 'replay' only reads
+# from it, whatever the age of the responses
+CACHE_MODE: str = os.environ.get('CENSUS_CACHE', 'on')
+CACHE_MAX_BYTES: int = int(os.environ.get('CENSUS_CACHE_MAX_MB', 512)) * 1024 * 1024
+ON: str = 'on'
+OFF: str = 'off'
+REPLAY: str = 'replay'
+
+HOUR: int = 3600
+DEFAULT_TTL: int = 6 * HOUR
+# seconds a response is valid by entity requested
+ENTITY_TTL: Dict[str, int] = {
+    'daos': 6 * HOUR,
+    'events': 24 * HOUR,
+    'proposals': 6 * HOUR,
+    'proposalVotes': 6 * HOUR,
+    'proposalStakes': 6 * HOUR,
+    'reputationHolders': 12 * HOUR,
+}
+
+ENTITY_PATTERN = re.compile(r'{\s*(?:\w+\s*:\s*)?(\w+)')
+
+lock: threading.Lock = threading.Lock()
+cache_bytes: Optional[int] = None
+
+
+class CacheMiss(Exception):
+    """
+    Raised in replay mode when a query is not cached.
+    """
+
+
+def normalize(query: str) -> str:
+    """
+    Removes the whitespaces which do not change the meaning of the query.
+    """
+    query = ' '.join(query.split())
+    return re.sub(r'\s*([{}():,])\s*', r'\1', query)
+
+
+def get_entity(query: str) -> str:
+    """
+    Gets the first entity requested in the query, e.g. 'proposals'.
+    """
+    match = ENTITY_PATTERN.search(query)
+    return match.group(1) if match else ''
+
+
+def get_path(query: str, scope: str = '') -> str:
+    """
+    Gets the file of a query, the responses of each scope (e.g. endpoint)
+    are cached apart. The default scope keeps the keys of older caches.
+    """
+    text: str = f'{scope}\n{normalize(query)}' if scope else normalize(query)
+    key: str = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, key[:2], f'{key}.json')
+
+
+def get(query: str, scope: str = '') -> Optional[Dict]:
+    """
+    Gets the cached response of a query.
+
+    Return:
+        The response if it is cached and not expired, None otherwise. In
+        replay mode expired responses are returned and a CacheMiss is raised
+        if the query is not cached.
+    """
+    if CACHE_MODE == OFF:
+        return None
+
+    path: str = get_path(query, scope)
+    try:
+        with open(path, 'r') as f:
+            cached: Dict = json.load(f)
+    except (OSError, ValueError):
+        if CACHE_MODE == REPLAY:
+            raise CacheMiss(f'Query not cached: {normalize(query)}')
+        return None
+
+    ttl: int = ENTITY_TTL.get(get_entity(query), DEFAULT_TTL)
+    if CACHE_MODE != REPLAY and time.time() - cached['created'] > ttl:
+        return None
+
+    # the modification time keeps the last use, it sorts the eviction
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+    return cached['data']
+
+
+def put(query: str, data: Dict, scope: str = '') -> None:
+    """
+    Stores the response of a query, evicting the least recently used
+    responses when the cache is bigger than CACHE_MAX_BYTES.
+    """
+    if CACHE_MODE != ON:
+        return
+
+    path: str = get_path(query, scope)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # write and rename so an interrupted run never leaves broken responses
+    tmp_path: str = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'created': time.time(), 'data': data}, f)
+    size: int = os.path.getsize(tmp_path)
+
+    global cache_bytes
+    with lock:
+        # an expired response which is replaced was already counted
+        replaced: int = os.path.getsize(path) if os.path.isfile(path) else 0
+        os.replace(tmp_path, path)
+        if cache_bytes is None:
+            cache_bytes = sum(s for _, _, s in list_files())
+        else:
+            cache_bytes += size - replaced
+
+        if cache_bytes > CACHE_MAX_BYTES:
+            evict()
+
+
+def list_files() -> List[Tuple[float, str, int]]:
+    """
+    Lists the cached responses as (last use, path, size).
+    """
+    files: List[Tuple[float, str, int]] = list()
+    for (dirpath, _, filenames) in os.walk(CACHE_DIR):
+        for file in filenames:
+            if not file.endswith('.json'):
+                continue
+            path: str = os.path.join(dirpath, file)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path, stat.st_size))
+
+    return files
+
+
+def evict() -> None:
+    """
+    Removes the least recently used responses until the cache takes 90% of
+    CACHE_MAX_BYTES. It must be called holding the lock.
+    """
+    global cache_bytes
+    files: List[Tuple[float, str, int]] = sorted(list_files())
+    cache_bytes = sum(s for _, _, s in files)
+
+    for _, path, size in files:
+        if cache_bytes <= CACHE_MAX_BYTES * 0.9:
+            break
+        try:
+            os.remove(path)
+            cache_bytes -= size
+        except OSError:
+            pass
@@ -0,0 +1,86 @@
+import os
+import csv
+import shutil
+import threading
+from typing import Dict, List
+from codec import dumps
+
+
+class JsonLinesSink:
+    """
+    Writes elements to a JSON lines file as they arrive. Each write is
+    flushed, so the elements written survive if the process dies, and it
+    holds a lock, so several threads can share the sink.
+    """
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        self.rows = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(path, 'ab' if append else 'wb')
+
+    def write(self, rows: List[Dict]) -> None:
+        lines: bytes = b''.join(dumps(r) + b'\n' for r in rows)
+        with self.lock:
+            self.file.write(lines)
+            self.file.flush()
+            self.rows += len(rows)
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class CsvSink:
+    """
+    Writes rows to a CSV file as they arrive, only the given columns are
+    written and in that order. The header is written if the file is empty.
+    Each write is flushed and holds a lock, like JsonLinesSink.
+    """
+    def __init__(self, path: str, columns: List[str], append: bool = False):
+        self.path = path
+        self.rows = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(path, 'a' if append else 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=columns, extrasaction='ignore')
+
+        if self.file.tell() == 0:
+            self.writer.writeheader()
+
+    def write(self, rows: List[Dict]) -> None:
+        with self.lock:
+            self.writer.writerows(rows)
+            self.file.flush()
+            self.rows += len(rows)
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def append_file(src: str, dst: str, skip_header: bool = False) -> None:
+    """
+    Appends the content of src to dst and removes src.
+
+    Parameters:
+        * src: file to append
+        * dst: file to append to, it is created if it does not exist
+        * skip_header: do not append the first line of src
+    """
+    with open(src, 'rb') as fsrc, open(dst, 'ab') as fdst:
+        if skip_header:
+            fsrc.readline()
+        shutil.copyfileobj(fsrc, fdst)
+
+    os.remove(src)
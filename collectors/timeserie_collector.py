@@ -1,133 +1,189 @@
 import os
+import sys
+import json
+import argparse
 import pandas as pd
-from typing import Dict, List
-from datetime import datetime
-from requester import n_requests
-import time
+from typing import Dict, Iterator, List, Tuple
+import crawler
+from requester import ELEMS_PER_CHUNK
+from sinks import CsvSink, append_file
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.cube import update_cube
+from common.sketches import update_sketches
+from common.storage import write_columnar
+
+COLUMNS: List[str] = ['daoId', 'daoName', 'actionType', 'unixDate', 'userId']
+OUT_FILE: str = os.path.join('datawarehouse', 'activity_serie.csv')
+# what the collected activity is complete up to, see load_state
+STATE_FILE: str = os.path.join('datawarehouse', 'activity_state.json')
+# action type, crawled entity and field of the user
+ACTIONS: List[Tuple[str, str, str]] = [
+    ('proposal', 'proposals', 'proposer'),
+    ('vote', 'votes', 'voter'),
+    ('stake', 'stakes', 'staker'),
+]
 
-DAO_QUERY: str = '{{daos(where: {{register: "registered"}}, first: {0}, skip: {1}\
-){{id name}}}}'
 
-PROPOSAL_QUERY: str = '{{proposals(where: {{dao: "{0}"}}, first: {1}, skip: {2}\
-){{proposer createdAt}}}}'
+def get_daos_id() -> pd.DataFrame:
+    daos: List[Dict] = crawler.load('daos')
+
+    return pd.DataFrame(daos)[['id', 'name']]
+
+
+def get_empty_state() -> Dict:
+    return {'size': 0, 'watermarks': dict(), 'offsets': dict()}
+
+
+def load_state() -> Dict:
+    """
+    Gets the state of the collected activity: the bytes of OUT_FILE
+    ('size'), the last unixDate collected by DAO and action type
+    ('watermarks') and the part of the crawl collected ('offsets', see
+    iter_actions). The rows after the size were appended by a run which did
+    not save its state, they are removed. Without a state file the
+    watermarks are calculated from the collected activity.
+    """
+    if not os.path.isfile(OUT_FILE):
+        return get_empty_state()
 
-VOTE_QUERY: str = '{{proposalVotes(where: {{dao: "{0}"}}, first: {1}, skip: {2}\
-){{voter createdAt}}}}'
+    if not os.path.isfile(STATE_FILE):
+        df: pd.DataFrame = pd.read_csv(OUT_FILE, header=0,
+            usecols=['daoId', 'actionType', 'unixDate'])
+        return {'size': os.path.getsize(OUT_FILE),
+            'watermarks': update_watermarks(watermarks=dict(), df=df), 'offsets': dict()}
 
-STAKE_QUERY: str = '{{proposalStakes(where: {{dao: "{0}"}}, first: {1}, skip: {2}\
-){{staker createdAt}}}}'
+    with open(STATE_FILE, 'r') as f:
+        state: Dict = json.load(f)
 
+    if os.path.getsize(OUT_FILE) > state['size']:
+        with open(OUT_FILE, 'r+b') as f:
+            f.truncate(state['size'])
+
+    return state
+
+
+def save_state(state: Dict) -> None:
+    tmp_path: str = f'{STATE_FILE}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, STATE_FILE)
+
+
+def update_watermarks(watermarks: Dict[str, Dict[str, int]], df: pd.DataFrame)\
+-> Dict[str, Dict[str, int]]:
+    """
+    Moves the watermarks up to the last unixDate of the new activity.
+    """
+    if df.empty:
+        return watermarks
+
+    dff: pd.DataFrame = df[['daoId', 'actionType', 'unixDate']].copy()
+    dff['unixDate'] = dff['unixDate'].astype('int64')
+    dff = dff.groupby(['daoId', 'actionType'])['unixDate'].max().reset_index()
+
+    for _, row in dff.iterrows():
+        marks: Dict[str, int] = watermarks.setdefault(row['daoId'], dict())
+        marks[row['actionType']] = max(int(row['unixDate']),
+            marks.get(row['actionType'], 0))
+
+    return watermarks
 
-def get_daos_id() -> pd.DataFrame:
-    print("Requesting DAO ids ...")
-    start: datetime = datetime.now()
-
-    daos: List[Dict] = n_requests(query=DAO_QUERY, result_key='daos')
-
-    print(f'DAO ids requested in {round((datetime.now() - start).total_seconds(), 2)}s')
-
-    return pd.DataFrame(daos)
-
-
-def get_proposals(daos: pd.DataFrame) -> pd.DataFrame:
-    df: pd.DataFrame = pd.DataFrame()
-
-    print("Requesting proposals ...")
-    start: datetime = datetime.now()
-
-    for _, row in daos.iterrows():
-        try:
-            proposals: List[Dict] = n_requests(query=PROPOSAL_QUERY, 
-                result_key='proposals', dao_id=row['id'])
-        except Exception as e:
-            print(e)
-            time.sleep(45)
-            proposals: List[Dict] = n_requests(query=PROPOSAL_QUERY, 
-                result_key='proposals', dao_id=row['id'])
-            print('Recovered: resuming requests')
-
-        finally:
-            dff: pd.DataFrame = pd.DataFrame(proposals)
-            dff = dff.rename(columns={'proposer': 'userId', 'createdAt': 'unixDate'})
-            dff['daoId'] = row['id']
-            dff['daoName'] = row['name']
-            dff['actionType'] = 'proposal'
-            df = df.append(dff, ignore_index=True)
-
-    print(f'Proposals requested in {round((datetime.now() - start).total_seconds(), 2)}s')
-    return df
-
-
-def get_votes(daos: pd.DataFrame) -> pd.DataFrame:
-    df: pd.DataFrame = pd.DataFrame()
-
-    print("Requesting votes ...")
-    start: datetime = datetime.now()
-
-    for _, row in daos.iterrows():
-        try:
-            votes: List[Dict] = n_requests(query=VOTE_QUERY, 
-                result_key='proposalVotes', dao_id=row['id'])
-        except Exception as e:
-            print(e)
-            time.sleep(45)
-            votes: List[Dict] = n_requests(query=VOTE_QUERY, 
-                result_key='proposalVotes', dao_id=row['id'])
-            print('Recovered: resuming requests')
-
-        finally:
-            dff: pd.DataFrame = pd.DataFrame(votes)
-            dff = dff.rename(columns={'voter': 'userId', 'createdAt': 'unixDate'})
-            dff['daoId'] = row['id']
-            dff['daoName'] = row['name']
-            dff['actionType'] = 'vote'
-            df = df.append(dff, ignore_index=True)
-
-    print(f'Votes requested in {round((datetime.now() - start).total_seconds(), 2)}s')
-    return df
-
-
-def get_stakes(daos: pd.DataFrame) -> pd.DataFrame:
-    df: pd.DataFrame = pd.DataFrame()
-
-    print("Requesting stakes ...")
-    start: datetime = datetime.now()
-
-    for _, row in daos.iterrows():
-        try:
-            stakes: List[Dict] = n_requests(query=STAKE_QUERY, 
-                result_key='proposalStakes', dao_id=row['id'])
-        except Exception as e:
-            print(e)
-            time.sleep(45)
-            stakes: List[Dict] = n_requests(query=STAKE_QUERY, 
-                result_key='proposalStakes', dao_id=row['id'])
-            print('Recovered: resuming requests')
-
-        finally:
-            dff: pd.DataFrame = pd.DataFrame(stakes)
-            dff = dff.rename(columns={'staker': 'userId', 'createdAt': 'unixDate'})
-            dff['daoId'] = row['id']
-            dff['daoName'] = row['name']
-            dff['actionType'] = 'stake'
-            df = df.append(dff, ignore_index=True)
-
-    print(f'Stakes requested in {round((datetime.now() - start).total_seconds(), 2)}s')
-    return df
+
+def get_since(watermarks: Dict[str, Dict[str, int]], action: str) -> Dict[str, int]:
+    """
+    Gets the watermark of an action type by DAO.
+    """
+    return {d_id: marks[action] for d_id, marks in watermarks.items() if action in marks}
+
+
+def iter_actions(daos: pd.DataFrame, watermarks: Dict[str, Dict[str, int]],
+    offsets: Dict[str, Dict] = None) -> Iterator[List[Dict]]:
+    """
+    Gets the activity of the DAOs from the crawl in chunks, so only a chunk
+    is kept in memory. The actions created before the watermarks are skipped.
+
+    Parameters:
+        * daos: 'id' and 'name' of the DAOs
+        * watermarks: last unixDate collected by DAO and action type
+        * offsets: part of the crawl of each append only entity collected
+            before, only the part after it is read. They are moved to the
+            end of the crawl as it is read.
+    """
+    offsets = offsets if offsets is not None else dict()
+    names: Dict[str, str] = dict(zip(daos['id'], daos['name']))
+    dao_ids: List[str] = daos['id'].tolist()
+    since: Dict[str, Dict[str, int]] = {action: get_since(watermarks, action)
+        for action, _, _ in ACTIONS}
+
+    for action, name, user_key in ACTIONS:
+        chunk: List[Dict] = list()
+
+        if crawler.ENTITIES[name].append_only:
+            elements, offsets[name] = crawler.iter_load_after(name=name,
+                mark=offsets.get(name, dict()), dao_ids=dao_ids)
+        else:
+            elements = crawler.iter_load(name=name, dao_ids=dao_ids)
+
+        for e in elements:
+            if e['dao'] not in names or int(e['createdAt']) <= since[action].get(e['dao'], 0):
+                continue
+
+            chunk.append({
+                'daoId': e['dao'],
+                'daoName': names[e['dao']],
+                'actionType': action,
+                'unixDate': e['createdAt'],
+                'userId': e[user_key],
+            })
+
+            if len(chunk) == ELEMS_PER_CHUNK:
+                yield chunk
+                chunk = list()
+
+        if chunk:
+            yield chunk
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Collects the activity of the DAOs.')
+    parser.add_argument('--incremental', action='store_true',
+        help='appends only the activity after the last collection')
+    parser.add_argument('--sketches', action='store_true',
+        help='stores the HyperLogLog sketches of the users by DAO and month too')
+    args = parser.parse_args()
+
+    incremental: bool = args.incremental and os.path.isfile(OUT_FILE)
+    state: Dict = load_state() if incremental else get_empty_state()
+    watermarks: Dict[str, Dict[str, int]] = state['watermarks']
+    offsets: Dict[str, Dict] = state['offsets']
+
     daos: pd.DataFrame = get_daos_id()
-    time.sleep(30)
-    df: pd.DataFrame = get_proposals(daos)
-    time.sleep(30)
-    df = df.append(get_votes(daos), ignore_index=True)
-    time.sleep(30)
-    df = df.append(get_stakes(daos), ignore_index=True)
-
-    # column reorder
-    df = df[['daoId', 'daoName', 'actionType', 'unixDate', 'userId']]
-
-    out_file: str = os.path.join('datawarehouse', 'activity_serie.csv')
-    df.to_csv(out_file, index=False)
-    print(f'DONE. Data stored in {out_file}')
+
+    # the new activity is written to a '.part' file which is appended once
+    # it is complete, and the state saved after it keeps the size of the
+    # activity, so the rows of an interrupted run are not collected twice
+    path: str = f'{OUT_FILE}.part'
+    with CsvSink(path=path, columns=COLUMNS) as sink:
+        for rows in iter_actions(daos=daos, watermarks=watermarks, offsets=offsets):
+            sink.write(rows)
+            watermarks = update_watermarks(watermarks=watermarks, df=pd.DataFrame(rows))
+
+    if incremental:
+        append_file(src=path, dst=OUT_FILE, skip_header=True)
+    else:
+        # the state of the activity replaced is not valid for the new one
+        if os.path.isfile(STATE_FILE):
+            os.remove(STATE_FILE)
+        os.replace(path, OUT_FILE)
+
+    save_state({'size': os.path.getsize(OUT_FILE), 'watermarks': watermarks, 'offsets': offsets})
+    write_columnar('activity_serie')
+    print(f'DONE. {sink.rows} actions stored in {OUT_FILE}')
+
+    rows: int = update_cube()
+    print(f'DONE. Monthly activity cube of {rows} rows stored')
+
+    if args.sketches:
+        rows = update_sketches()
+        print(f'DONE. {rows} user sketches stored')
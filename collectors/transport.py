@@ -0,0 +1,162 @@
+import os
+import ssl
+import gzip
+import zlib
+import queue
+import http.client
+import urllib.parse
+import urllib.request
+from typing import Dict, Optional, Tuple
+
+# seconds to open a connection and to wait for each read of the response
+CONNECT_TIMEOUT: float = float(os.environ.get('CENSUS_CONNECT_TIMEOUT', 10))
+READ_TIMEOUT: float = float(os.environ.get('CENSUS_READ_TIMEOUT', 60))
+# idle connections kept open to the endpoint
+POOL_SIZE: int = int(os.environ.get('CENSUS_POOL_SIZE', os.environ.get('CENSUS_WORKERS', 8)))
+ACCEPT_ENCODING: str = 'gzip, deflate'
+
+Connection = http.client.HTTPConnection
+
+
+class HTTPStatusError(Exception):
+    """
+    Raised when the endpoint answers with an HTTP error status.
+    """
+    def __init__(self, code: int, headers: Dict[str, str], body: bytes):
+        super().__init__(f'HTTP {code}')
+        self.code = code
+        self.headers = headers
+        self.body = body
+
+
+def decompress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    if encoding == 'deflate':
+        # servers send deflate with or without the zlib header
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+class HttpTransport:
+    """
+    Sends POST requests to an endpoint over a pool of keep-alive
+    connections, so the pages of a crawl do not open a connection (and
+    negotiate TLS) each. Responses are requested compressed. It can be
+    shared by several threads, each request takes a connection of the pool
+    or opens a new one, and gives it back when the response is read.
+    """
+    def __init__(self, url: str, pool_size: int = POOL_SIZE,
+        connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT):
+        parts = urllib.parse.urlsplit(url)
+        self.url = url
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path or '/'
+        if parts.query:
+            self.path += f'?{parts.query}'
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool: queue.LifoQueue = queue.LifoQueue(maxsize=max(1, pool_size))
+        self.context: Optional[ssl.SSLContext] = \
+            ssl.create_default_context() if self.scheme == 'https' else None
+
+        # the proxy of the environment, like urllib does
+        self.proxy: str = ''
+        if not urllib.request.proxy_bypass(self.host):
+            self.proxy = urllib.request.getproxies().get(self.scheme, '')
+
+    def connect(self) -> Connection:
+        if self.proxy:
+            proxy = urllib.parse.urlsplit(self.proxy)
+            host, port = proxy.hostname, proxy.port
+        else:
+            host, port = self.host, self.port
+
+        if self.scheme == 'https':
+            conn: Connection = http.client.HTTPSConnection(host, port,
+                timeout=self.connect_timeout, context=self.context)
+            if self.proxy:
+                conn.set_tunnel(self.host, self.port)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.connect_timeout)
+
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        return conn
+
+    def acquire(self) -> Tuple[Connection, bool]:
+        """
+        Gets an idle connection of the pool, or a new one.
+
+        Return:
+            The connection and whether it was reused.
+        """
+        try:
+            return self.pool.get_nowait(), True
+        except queue.Empty:
+            return self.connect(), False
+
+    def release(self, conn: Connection) -> None:
+        try:
+            self.pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def post(self, body: bytes, content_type: str = 'application/json') -> Tuple[bytes, int]:
+        """
+        Sends a POST request. A reused connection which the endpoint closed
+        while it was idle is replaced by a new one, once.
+
+        Return:
+            The decompressed body of the response and the bytes received.
+        """
+        headers: Dict[str, str] = {
+            'Content-Type': content_type,
+            'Accept': 'application/json',
+            'Accept-Encoding': ACCEPT_ENCODING,
+            'Connection': 'keep-alive',
+        }
+        # plain HTTP proxies take the whole URL
+        path: str = self.url if self.proxy and self.scheme == 'http' else self.path
+
+        while True:
+            conn, reused = self.acquire()
+            try:
+                conn.request('POST', path, body=body, headers=headers)
+                response: http.client.HTTPResponse = conn.getresponse()
+                raw: bytes = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                self.release(conn)
+            break
+
+        content: bytes = decompress(raw, response.getheader('Content-Encoding', '').lower())
+        if response.status >= 400:
+            raise HTTPStatusError(response.status, dict(response.getheaders()), content)
+
+        return content, len(raw)
+
+    def close(self) -> None:
+        """
+        Closes the idle connections.
+        """
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except queue.Empty:
+                return
@@ -1,8 +1,8 @@
 #!/bin/bash
-rm datawarehouse/activity_serie.csv
 rm datawarehouse/census.csv
 rm datawarehouse/proposals.csv
 
+python collectors/crawler.py
 python collectors/census_collector.py
 python collectors/proposal_collector.py
-python collectors/timeserie_collector.py
\ No newline at end of file
+python collectors/timeserie_collector.py --incremental
\ No newline at end of file
@@ -1,12 +1,12 @@
 from datetime import datetime
 from typing import Dict, List, Set
-from requester import n_requests
+from requester import n_requests, n_requests_by_dao
 
-DAO_QUERY: str = '{{daos(where: {{register: "registered"}}, first: {0}, skip: {1}\
+DAO_QUERY: str = '{{daos(where: {{register: "registered", id_gt: "{1}"}}, first: {0}, orderBy: id\
 ){{id}}}}'
 
-USER_QUERY: str = '{{reputationHolders(where: {{dao: "{0}"}}, first: {1}, skip: {2}\
-){{address}}}}'
+USER_QUERY: str = '{{reputationHolders(where: {{dao: "{0}", id_gt: "{2}"}}, first: {1}, orderBy: id\
+){{id address}}}}'
 
 if __name__ == '__main__':
     print("Requesting DAOs ...")
@@ -18,9 +18,9 @@ if __name__ == '__main__':
     print("Requesting users ...")
     start: datetime = datetime.now()
     users = list()
-    for d in daos:
-        aux: List[Dict] = n_requests(query=USER_QUERY, 
-            result_key='reputationHolders', dao_id=d)
+    results: Dict[str, List[Dict]] = n_requests_by_dao(query=USER_QUERY,
+        result_key='reputationHolders', dao_ids=daos)
+    for aux in results.values():
         users = users + aux
 
     print(f'Users requested in {round((datetime.now() - start).total_seconds(), 2)}s')
@@ -0,0 +1,156 @@
+import os
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+# the appends of several processes are serialized with a file lock where
+# the platform has it
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+ADDRESSES_FILE: str = os.path.join('datawarehouse', 'addresses.csv')
+CODE_DTYPE: str = 'int32'
+MAX_CODE: int = np.iinfo(np.int32).max
+# members of the address columns which are not addresses, e.g. the DAO
+# which aggregates all of them in common.cube. Their codes are negative,
+# from -1 down, and they are never saved to the book.
+ALL: str = 'all'
+RESERVED: Dict[str, int] = {ALL: -1}
+
+
+class AddressBook:
+    """
+    Maps each hex id (DAOs, users, proposals) to a dense int32 code, so the
+    datasets store and group small integers instead of long strings. Codes
+    are given in order of appearance and never change once saved.
+
+    Parameters:
+        * path: CSV file the book is persisted to
+    """
+    def __init__(self, path: str = ADDRESSES_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.addresses: List[str] = list()
+        self.codes: Dict[str, int] = dict()
+        self.saved = 0
+        # bytes of the book file when it was loaded or last saved
+        self.size = 0
+        self.fingerprints: Dict[int, str] = dict()
+
+        if os.path.isfile(path):
+            self.size = os.path.getsize(path)
+            df: pd.DataFrame = pd.read_csv(path, header=0, dtype={'code': 'int64',
+                'address': 'object'})
+            df = df.sort_values('code')
+            if not np.array_equal(df['code'].to_numpy(), np.arange(len(df.index))) or \
+                df['address'].duplicated().any():
+                raise ValueError(f'{path} is corrupt, its codes must be 0 to {len(df.index) - 1} '
+                    'and each address must have one')
+
+            self.addresses = df['address'].tolist()
+            self.codes = {a: i for i, a in enumerate(self.addresses)}
+            self.saved = len(self.addresses)
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def get_code(self, address: str) -> int:
+        """
+        Gets the code of an address, a new one is given if it is unknown.
+        """
+        if address in RESERVED:
+            return RESERVED[address]
+
+        with self.lock:
+            code: Optional[int] = self.codes.get(address)
+            if code is None:
+                if len(self.addresses) > MAX_CODE:
+                    raise OverflowError('No int32 codes left in the address book')
+                code = len(self.addresses)
+                self.codes[address] = code
+                self.addresses.append(address)
+
+        return code
+
+    def get_fingerprint(self, n: int = None) -> str:
+        """
+        Gets an id of the first n codes, all by default, e.g. to check that
+        the codes stored in a dataset were given by this book. Codes are
+        never changed, so it does not change as the book grows.
+        """
+        n = len(self.addresses) if n is None else n
+        if n > len(self.addresses):
+            return ''
+
+        if n not in self.fingerprints:
+            sha = hashlib.sha256('\n'.join(self.addresses[:n]).encode('utf-8'))
+            self.fingerprints[n] = f'{n}:{sha.hexdigest()}'
+
+        return self.fingerprints[n]
+
+    def encode(self, addresses: pd.Series) -> pd.Series:
+        """
+        Converts a column of hex ids to their codes. Each distinct id is
+        looked up once.
+        """
+        inverse, uniques = pd.factorize(addresses)
+        codes: np.ndarray = np.array([self.get_code(a) for a in uniques], dtype=CODE_DTYPE)
+
+        return pd.Series(codes[inverse], index=addresses.index, name=addresses.name)
+
+    def decode(self, codes: pd.Series) -> pd.Series:
+        """
+        Converts a column of codes back to their hex ids, e.g. to display
+        them.
+        """
+        # the reserved codes index the end of the array
+        reserved: List[str] = sorted(RESERVED, key=RESERVED.get)
+        addresses: np.ndarray = np.array(self.addresses + reserved, dtype=object)
+
+        return pd.Series(addresses[codes.to_numpy()], index=codes.index, name=codes.name)
+
+    def save(self) -> None:
+        """
+        Appends the codes given since the last save to the book file. It
+        raises RuntimeError if another process appended to it meanwhile,
+        since both gave the same codes to different addresses.
+        """
+        with self.lock:
+            new: List[str] = self.addresses[self.saved:]
+            if not new:
+                return
+
+            df: pd.DataFrame = pd.DataFrame({
+                'code': range(self.saved, self.saved + len(new)),
+                'address': new,
+            })
+            with open(self.path, 'a', newline='') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0, os.SEEK_END)
+                if f.tell() != self.size:
+                    raise RuntimeError(f'{self.path} was modified by another process, '
+                        'the codes given since it was loaded are not valid')
+
+                df.to_csv(f, header=self.size == 0, index=False)
+                f.flush()
+                self.size = f.tell()
+            self.saved += len(new)
+
+
+book: Optional[AddressBook] = None
+
+
+def get_book() -> AddressBook:
+    """
+    Gets the address book of the datawarehouse, it is loaded once by process.
+    """
+    global book
+    if book is None:
+        book = AddressBook()
+
+    return book
@@ -0,0 +1,107 @@
+import pandas as pd
+from typing import List
+from common.addresses import ALL, RESERVED, get_book
+from common.loader import load
+from common.storage import read_table, write_table
+
+CUBE: str = 'activity_cube'
+# member of the daoId and actionType dimensions which aggregates all of
+# them, ALL_DAO is its reserved code in the address book
+ALL_DAO: int = RESERVED[ALL]
+# dimensions aggregated by each level of the cube, the month is always kept
+LEVELS: List[List[str]] = [
+    ['daoId', 'actionType'],
+    ['daoId'],
+    ['actionType'],
+    [],
+]
+
+
+def to_month(unix_dates: pd.Series) -> pd.Series:
+    """
+    Truncates unix dates, in seconds, to the first second of their month.
+    """
+    months = unix_dates.to_numpy().astype('datetime64[s]').astype('datetime64[M]')
+    return pd.Series(months.astype('datetime64[s]').astype('int64'), index=unix_dates.index)
+
+
+def build_cube(activity: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregates the activity by (daoId, month, actionType) with the number of
+    actions and of distinct users. Distinct users can not be added up, so
+    the cube also has the rows of each level of LEVELS, where the dimensions
+    aggregated are ALL.
+
+    Parameters:
+        * activity: daoId (as codes), actionType, unixDate and userId columns
+    Return:
+        The cube with daoId, month, actionType, nActions and nUsers columns.
+    """
+    df: pd.DataFrame = pd.DataFrame({
+        'daoId': activity['daoId'],
+        'actionType': activity['actionType'].astype('object'),
+        'month': to_month(activity['unixDate']),
+        'userId': activity['userId'],
+    })
+    levels: List[pd.DataFrame] = list()
+    for keys in LEVELS:
+        level: pd.DataFrame = df.groupby(keys + ['month'], sort=False).agg(
+            nActions=('userId', 'size'),
+            nUsers=('userId', 'nunique'),
+        ).reset_index()
+
+        if 'daoId' not in keys:
+            level['daoId'] = ALL_DAO
+        if 'actionType' not in keys:
+            level['actionType'] = ALL
+        levels.append(level)
+
+    cube: pd.DataFrame = pd.concat(levels, ignore_index=True, sort=False)
+    cube = cube.sort_values(['daoId', 'month', 'actionType'], ignore_index=True)
+
+    return cube[['daoId', 'month', 'actionType', 'nActions', 'nUsers']]
+
+
+def update_cube() -> int:
+    """
+    Builds the cube from the collected activity and stores it in the
+    datawarehouse.
+
+    Return:
+        The number of rows of the cube.
+    """
+    # parsed once, so it is neither memoized nor cached, see common.loader
+    activity: pd.DataFrame = read_table('activity_serie',
+        columns=['daoId', 'actionType', 'unixDate', 'userId'])
+    cube: pd.DataFrame = build_cube(activity)
+
+    # write_table takes the hex ids
+    cube['daoId'] = get_book().decode(cube['daoId'])
+    write_table(df=cube, name=CUBE)
+
+    return len(cube.index)
+
+
+def read_cube() -> pd.DataFrame:
+    return load(CUBE)
+
+
+def select(cube: pd.DataFrame, by_dao: bool, action_type: str = ALL) -> pd.DataFrame:
+    """
+    Gets a level of the cube as a serie by month.
+
+    Parameters:
+        * cube: the cube, see read_cube
+        * by_dao: rows by DAO, otherwise the rows of all the DAOs together
+        * action_type: rows of an action type, or of all of them with ALL
+    Return:
+        The rows of the level with a 'date' column, the first day of the
+        month.
+    """
+    rows: pd.Series = cube['actionType'] == action_type
+    rows &= (cube['daoId'] != ALL_DAO) if by_dao else (cube['daoId'] == ALL_DAO)
+
+    df: pd.DataFrame = cube[rows].copy()
+    df['date'] = pd.to_datetime(df['month'], unit='s')
+
+    return df.sort_values(['month'])
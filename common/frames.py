@@ -0,0 +1,46 @@
+import pandas as pd
+from typing import Any, List
+from common.addresses import get_book
+
+
+def join_df_by_id(df1: pd.DataFrame, df2: pd.DataFrame, keys: List[str],
+    default: Any = None, report: bool = True) -> pd.DataFrame:
+    """
+    Adds the keys of df2 to df1 matching their rows by 'id', it is a hash
+    join so it takes linear time.
+
+    Parameters:
+        * df1: data frame to add the keys to, it keeps its rows and order
+        * df2: data frame with the keys, if an id is repeated the first row
+            is used
+        * keys: columns of df2 to add, they replace the ones of df1
+        * default: value of the keys for the ids of df1 which are not in df2
+        * report: print the ids of df1 which are not in df2, by name if df1
+            has a 'name' column, address codes are printed as hex ids
+    Return:
+        A new data frame with the columns of df1 and the keys.
+    """
+    right: pd.DataFrame = df2.drop_duplicates(subset='id', keep='first')[['id'] + keys]
+    left: pd.DataFrame = df1.drop(columns=[k for k in keys if k in df1.columns])
+
+    df: pd.DataFrame = left.merge(right, on='id', how='left', indicator=True)
+    df.index = df1.index
+
+    unmatched: pd.Series = df['_merge'] == 'left_only'
+    df = df.drop(columns=['_merge'])
+
+    if unmatched.any():
+        if default is not None:
+            for k in keys:
+                df.loc[unmatched, k] = default
+                if isinstance(default, int) and pd.api.types.is_integer_dtype(right[k]):
+                    df[k] = df[k].astype(right[k].dtype)
+
+        if report:
+            label: str = 'name' if 'name' in df.columns else 'id'
+            missing: pd.Series = df.loc[unmatched, label]
+            if label == 'id' and pd.api.types.is_integer_dtype(missing):
+                missing = get_book().decode(missing)
+            print(f'Ids without {", ".join(keys)}: {", ".join(map(str, missing))}')
+
+    return df
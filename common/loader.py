@@ -0,0 +1,185 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from common.addresses import get_book
+from common.storage import SCHEMAS, get_path, read_table
+
+# typed datasets parsed before are kept here, 'off' disables it
+LOADER_CACHE: str = os.environ.get('CENSUS_LOADER_CACHE', 'on')
+# apart from the response cache, which evicts the files of its directory
+LOADER_CACHE_DIR: str = os.environ.get('CENSUS_LOADER_CACHE_DIR', '.census_datasets')
+HASH_CHUNK: int = 1024 * 1024
+
+# (path, modification time, size) of the files of a dataset
+Signature = List[Tuple[str, int, int]]
+# name of a dataset and its columns, None if all of them
+Key = Tuple[str, Optional[Tuple[str, ...]]]
+
+memo: Dict[Key, Tuple[Signature, pd.DataFrame]] = dict()
+
+
+def get_signature(name: str) -> Signature:
+    signature: Signature = list()
+    for extension in ['csv', 'parquet']:
+        path: str = get_path(name, extension)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+
+    return signature
+
+
+def get_hash(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            sha.update(chunk)
+
+    return sha.hexdigest()
+
+
+def get_cache_path(key: Key, extension: str) -> str:
+    name, columns = key
+    if columns:
+        name += '-' + hashlib.sha256(','.join(columns).encode('utf-8')).hexdigest()[:12]
+
+    return os.path.join(LOADER_CACHE_DIR, f'{name}.{extension}')
+
+
+def get_address_columns(df: pd.DataFrame, name: str) -> List[str]:
+    return [c for c, t in SCHEMAS[name].items() if t == 'address' and c in df.columns]
+
+
+def to_cached(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """
+    Replaces the address codes by categories of their hex ids, codes are
+    only valid with the address book they were given by.
+    """
+    df = df.copy()
+    for c in get_address_columns(df, name):
+        codes, uniques = pd.factorize(df[c])
+        df[c] = pd.Categorical.from_codes(codes,
+            categories=get_book().decode(pd.Series(uniques)).tolist())
+
+    return df
+
+
+def from_cached(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """
+    Gets back the address codes of a cached dataset, only the categories
+    are looked up in the address book.
+    """
+    for c in get_address_columns(df, name):
+        categories: pd.Series = pd.Series(df[c].cat.categories.to_numpy(dtype=object))
+        codes: pd.Series = get_book().encode(categories)
+        df[c] = codes.to_numpy()[df[c].cat.codes.to_numpy()]
+
+    return df
+
+
+def read_cached(key: Key, signature: Signature) -> Optional[pd.DataFrame]:
+    """
+    Gets a dataset from the disk cache if its files did not change since it
+    was cached. Files with a new modification time but the same size and
+    content, e.g. after a checkout, are still valid.
+    """
+    meta_path: str = get_cache_path(key, 'json')
+    try:
+        with open(meta_path, 'r') as f:
+            meta: Dict = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta['pandas'] != pd.__version__:
+        return None
+
+    cached: Signature = [tuple(s) for s in meta['signature']]
+    if cached != signature:
+        if [(p, s) for p, _, s in cached] != [(p, s) for p, _, s in signature] or \
+            any(get_hash(p) != meta['hashes'].get(p) for p, _, _ in signature):
+            return None
+
+        meta['signature'] = signature
+        write_meta(meta_path, meta)
+
+    try:
+        return from_cached(pd.read_pickle(get_cache_path(key, 'pkl')), key[0])
+    except (OSError, ValueError, EOFError):
+        return None
+
+
+def write_meta(path: str, meta: Dict) -> None:
+    tmp_path: str = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, path)
+
+
+def write_cached(key: Key, signature: Signature, df: pd.DataFrame) -> None:
+    os.makedirs(LOADER_CACHE_DIR, exist_ok=True)
+
+    path: str = get_cache_path(key, 'pkl')
+    tmp_path: str = f'{path}.{os.getpid()}.tmp'
+    to_cached(df, key[0]).to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+    write_meta(get_cache_path(key, 'json'), {
+        'pandas': pd.__version__,
+        'signature': signature,
+        'hashes': {p: get_hash(p) for p, _, _ in signature},
+    })
+
+
+def get_dataset(name: str, columns: List[str] = None) -> pd.DataFrame:
+    """
+    Gets some columns of a dataset, all by default, parsing only those
+    columns if they are neither memoized nor in the disk cache, or the files
+    of the dataset changed. They are taken from the memoized dataset if all
+    its columns were loaded before.
+    """
+    signature: Signature = get_signature(name)
+    full: Optional[Tuple[Signature, pd.DataFrame]] = memo.get((name, None))
+    if full and full[0] == signature:
+        return full[1][columns] if columns else full[1]
+
+    key: Key = (name, tuple(columns) if columns else None)
+    if key in memo and memo[key][0] == signature:
+        return memo[key][1]
+
+    df: Optional[pd.DataFrame] = None
+    if LOADER_CACHE != 'off':
+        df = read_cached(key, signature)
+
+    if df is None:
+        df = read_table(name, columns=columns)
+        if LOADER_CACHE != 'off':
+            write_cached(key, signature, df)
+
+    memo[key] = (signature, df)
+    return df
+
+
+def load(name: str, columns: List[str] = None) -> pd.DataFrame:
+    """
+    Loads a dataset of the datawarehouse with the dtypes of its schema, see
+    common.storage.read_table. Each dataset is parsed once by process,
+    only the columns requested.
+
+    Parameters:
+        * name: key of SCHEMAS
+        * columns: columns to load, all by default
+    Return:
+        A copy, so callers can modify it.
+    """
+    return get_dataset(name, columns=columns).copy()
+
+
+def preload(names: List[str]) -> None:
+    """
+    Parses the datasets which are not cached yet, e.g. before several
+    processes load them.
+    """
+    for name in names:
+        get_dataset(name)
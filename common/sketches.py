@@ -0,0 +1,185 @@
+import zlib
+import base64
+import numpy as np
+import pandas as pd
+from typing import List
+from common.addresses import get_book
+from common.cube import to_month
+from common.loader import load
+from common.storage import read_table, write_table
+
+SKETCHES: str = 'activity_sketches'
+# HyperLogLog with 2^PRECISION registers, the standard error of the counts
+# is about 1.04 / sqrt(2^PRECISION), 1.6%
+PRECISION: int = 12
+REGISTERS: int = 2 ** PRECISION
+HASH_BITS: int = 64
+
+
+def get_bit_length(values: np.ndarray) -> np.ndarray:
+    """
+    Gets the number of bits of each uint64, without float rounding.
+    """
+    x: np.ndarray = values.copy()
+    length: np.ndarray = np.zeros(len(x), dtype='uint8')
+
+    for shift in [32, 16, 8, 4, 2, 1]:
+        big: np.ndarray = x >= np.uint64(1 << shift)
+        length[big] += shift
+        x[big] >>= np.uint64(shift)
+
+    return length + (x > 0).astype('uint8')
+
+
+def get_hashes(users: pd.Series) -> np.ndarray:
+    """
+    Hashes the users to uint64. The hash is stable between runs, so stored
+    sketches can be merged with new ones.
+    """
+    if pd.api.types.is_integer_dtype(users):
+        users = get_book().decode(users)
+
+    return pd.util.hash_array(users.to_numpy(dtype=object))
+
+
+def build_sketches(activity: pd.DataFrame) -> pd.DataFrame:
+    """
+    Builds the HyperLogLog sketch of the users of each (daoId, month).
+
+    Parameters:
+        * activity: daoId, unixDate and userId columns
+    Return:
+        A data frame with daoId, month and sketch columns, each sketch is an
+        uint8 array of REGISTERS registers.
+    """
+    hashes: np.ndarray = get_hashes(activity['userId'])
+    suffix_bits: int = HASH_BITS - PRECISION
+    suffixes: np.ndarray = hashes & np.uint64((1 << suffix_bits) - 1)
+
+    df: pd.DataFrame = pd.DataFrame({
+        'daoId': activity['daoId'].to_numpy(),
+        'month': to_month(activity['unixDate']).to_numpy(),
+        'register': (hashes >> np.uint64(suffix_bits)).astype('int64'),
+        # position of the first 1 bit of the suffix
+        'rank': (suffix_bits + 1 - get_bit_length(suffixes)).astype('uint8'),
+    })
+    df = df.groupby(['daoId', 'month', 'register'])['rank'].max().reset_index()
+
+    groups: pd.Series = df.groupby(['daoId', 'month']).ngroup()
+    registers: np.ndarray = np.zeros((groups.max() + 1 if len(groups) else 0, REGISTERS),
+        dtype='uint8')
+    registers[groups.to_numpy(), df['register'].to_numpy()] = df['rank'].to_numpy()
+
+    sketches: pd.DataFrame = df[['daoId', 'month']].drop_duplicates(ignore_index=True)
+    sketches['sketch'] = list(registers)
+
+    return sketches
+
+
+def merge_by(sketches: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    """
+    Merges the sketches of each group of keys, the merge of sketches is the
+    sketch of the union of their users.
+
+    Return:
+        A data frame with the keys and sketch columns.
+    """
+    df: pd.DataFrame = sketches.sort_values(keys) if keys else sketches
+    matrix: np.ndarray = np.stack(df['sketch'].to_numpy())
+
+    if keys:
+        starts: np.ndarray = np.flatnonzero(~df.duplicated(subset=keys).to_numpy())
+        merged: pd.DataFrame = df[keys].iloc[starts].reset_index(drop=True)
+    else:
+        starts: np.ndarray = np.array([0])
+        merged: pd.DataFrame = pd.DataFrame(index=[0])
+
+    merged['sketch'] = list(np.maximum.reduceat(matrix, starts, axis=0))
+    return merged
+
+
+def estimate(sketches: pd.Series) -> pd.Series:
+    """
+    Estimates the number of distinct users of each sketch, with linear
+    counting for the small cardinalities.
+    """
+    matrix: np.ndarray = np.stack(sketches.to_numpy()).astype('float64')
+    alpha: float = 0.7213 / (1 + 1.079 / REGISTERS)
+
+    raw: np.ndarray = alpha * REGISTERS ** 2 / np.sum(np.power(2.0, -matrix), axis=1)
+    zeros: np.ndarray = np.sum(matrix == 0, axis=1)
+    small: np.ndarray = (raw <= 2.5 * REGISTERS) & (zeros > 0)
+    linear: np.ndarray = REGISTERS * np.log(REGISTERS / np.maximum(zeros, 1))
+
+    return pd.Series(np.round(np.where(small, linear, raw)).astype('int64'),
+        index=sketches.index)
+
+
+def count_distinct(sketches: pd.DataFrame, by: List[str]) -> pd.DataFrame:
+    """
+    Estimates the distinct users by group, e.g. by=['month'] gets the
+    active users of all the DAOs by month and by=['daoId'] the users of each
+    DAO. Other groups, like quarters, can be added as columns first.
+
+    Return:
+        A data frame with the by columns and nUsers.
+    """
+    df: pd.DataFrame = merge_by(sketches, keys=by)
+    df['nUsers'] = estimate(df['sketch'])
+
+    return df.drop(columns=['sketch'])
+
+
+def count_rolling(sketches: pd.DataFrame, months: int) -> pd.DataFrame:
+    """
+    Estimates the distinct users of all the DAOs in a rolling window of
+    months, ending at each month.
+
+    Return:
+        A data frame with month and nUsers columns.
+    """
+    df: pd.DataFrame = merge_by(sketches, keys=['month'])
+    index: np.ndarray = df['month'].to_numpy().astype('datetime64[s]').astype('datetime64[M]')
+    index = index.astype('int64')
+
+    windows: List[np.ndarray] = [
+        np.maximum.reduce(np.stack(df['sketch'][(index > i - months) & (index <= i)].to_numpy()))
+        for i in index]
+    df['nUsers'] = estimate(pd.Series(windows, index=df.index))
+
+    return df.drop(columns=['sketch'])
+
+
+def to_text(sketch: np.ndarray) -> str:
+    return base64.b64encode(zlib.compress(sketch.tobytes())).decode('ascii')
+
+
+def from_text(text: str) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(base64.b64decode(text)), dtype='uint8')
+
+
+def update_sketches() -> int:
+    """
+    Builds the sketches from the collected activity and stores them in the
+    datawarehouse.
+
+    Return:
+        The number of sketches.
+    """
+    activity: pd.DataFrame = read_table('activity_serie',
+        columns=['daoId', 'unixDate', 'userId'])
+    sketches: pd.DataFrame = build_sketches(activity)
+
+    # write_table takes the hex ids
+    sketches['daoId'] = get_book().decode(sketches['daoId'])
+    sketches['sketch'] = sketches['sketch'].map(to_text)
+    write_table(df=sketches, name=SKETCHES)
+
+    return len(sketches.index)
+
+
+def read_sketches() -> pd.DataFrame:
+    sketches: pd.DataFrame = load(SKETCHES)
+    sketches['sketch'] = sketches['sketch'].map(from_text)
+
+    return sketches
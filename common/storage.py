@@ -0,0 +1,295 @@
+import os
+import pandas as pd
+from typing import Dict, List
+from common.addresses import get_book
+from common.wei import get_limb_columns, join, split
+
+# pyarrow is optional, without it only the CSV files are written and read
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+DATAWAREHOUSE: str = 'datawarehouse'
+CHUNK_ROWS: int = 500000
+# key of the Parquet metadata with the fingerprint of the address book
+BOOK_KEY: bytes = b'census.addresses'
+
+
+def get_wei_dtypes(column: str) -> Dict[str, str]:
+    return {c: 'int64' for c in get_limb_columns(column)}
+
+
+# dtypes of the datasets, 'category' columns are stored dictionary encoded
+# and 'address' columns are hex ids stored as their codes in the address
+# book, the CSV files keep the hex ids
+SCHEMAS: Dict[str, Dict[str, str]] = {
+    'census': {
+        'id': 'address',
+        'name': 'object',
+        'nUsers': 'int64',
+        # DAOs without NewDAO event have no birth
+        'birth': 'Int64',
+        'nProposals': 'int64',
+        'nVotes': 'int64',
+        'nStakes': 'int64',
+        'ETH': 'float64',
+        'GEN': 'float64',
+        'otherTokens': 'float64',
+    },
+    'proposals': {
+        'daoId': 'address',
+        'daoName': 'category',
+        'proposalId': 'address',
+        'createdAt': 'int64',
+        # wei amounts overflow int64, they are stored as limbs, see common.wei
+        **get_wei_dtypes('totalRepWhenExecuted'),
+        **get_wei_dtypes('votesFor'),
+        **get_wei_dtypes('votesAgainst'),
+        'hasPassed': 'bool',
+        'quorum': 'int64',
+        'boostedAt': 'Int64',
+        **get_wei_dtypes('stakesFor'),
+        **get_wei_dtypes('stakesAgainst'),
+        'differentStakers': 'int64',
+    },
+    'activity_serie': {
+        'daoId': 'address',
+        'daoName': 'category',
+        'actionType': 'category',
+        'unixDate': 'int64',
+        'userId': 'address',
+    },
+    # see common.cube
+    'activity_cube': {
+        'daoId': 'address',
+        'month': 'int64',
+        'actionType': 'category',
+        'nActions': 'int64',
+        'nUsers': 'int64',
+    },
+    # see common.sketches
+    'activity_sketches': {
+        'daoId': 'address',
+        'month': 'int64',
+        'sketch': 'object',
+    },
+}
+
+# wei columns of the datasets, the CSV files keep them as decimal integers
+# and they are loaded as the limbs of the schema
+WEI_COLUMNS: Dict[str, List[str]] = {
+    'proposals': ['totalRepWhenExecuted', 'votesFor', 'votesAgainst', 'stakesFor',
+        'stakesAgainst'],
+}
+
+
+def get_path(name: str, extension: str) -> str:
+    return os.path.join(DATAWAREHOUSE, f'{name}.{extension}')
+
+
+def get_wei_limbs(name: str) -> Dict[str, str]:
+    """
+    Gets the wei column of each limb of a dataset.
+    """
+    return {limb: c for c in WEI_COLUMNS.get(name, []) for limb in get_limb_columns(c)}
+
+
+def get_csv_columns(name: str, columns: List[str] = None) -> List[str]:
+    """
+    Gets the CSV columns some columns of the schema are parsed from, all by
+    default.
+    """
+    limbs: Dict[str, str] = get_wei_limbs(name)
+    csv_columns: List[str] = [limbs.get(c, c) for c in (columns or SCHEMAS[name].keys())]
+    return list(dict.fromkeys(csv_columns))
+
+
+def get_csv_dtypes(name: str, columns: List[str] = None) -> Dict[str, str]:
+    """
+    Gets the dtypes to parse a CSV dataset with, categories, addresses and
+    wei amounts are parsed as strings and converted later.
+    """
+    schema: Dict[str, str] = SCHEMAS[name]
+    wei: List[str] = WEI_COLUMNS.get(name, [])
+    return {c: 'object' if c in wei or schema[c] in ['category', 'address'] else schema[c]
+        for c in get_csv_columns(name, columns)}
+
+
+def to_limbs(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """
+    Replaces the wei columns of a CSV dataset by their limbs.
+    """
+    columns: List[str] = [c for c in WEI_COLUMNS.get(name, []) if c in df.columns]
+    if not columns:
+        return df
+
+    df = df.copy()
+    for c in columns:
+        hi, lo = get_limb_columns(c)
+        df[hi], df[lo] = split(df[c].where(df[c].notna(), None))
+
+    return df.drop(columns=columns)
+
+
+def from_limbs(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """
+    Replaces the limbs of a dataset by their wei columns, as decimal
+    integers, in the order of the CSV file.
+    """
+    df = df.copy()
+    for c in WEI_COLUMNS.get(name, []):
+        hi, lo = get_limb_columns(c)
+        df[c] = pd.Series(join(df[hi].to_numpy(), df[lo].to_numpy()), index=df.index,
+            dtype=object)
+
+    return df[get_csv_columns(name)]
+
+
+def get_arrow_schema(name: str):
+    types: Dict = {
+        'object': pyarrow.string(),
+        'category': pyarrow.string(),
+        'address': pyarrow.int32(),
+        'int64': pyarrow.int64(),
+        'Int64': pyarrow.int64(),
+        'bool': pyarrow.bool_(),
+        'float64': pyarrow.float64(),
+    }
+    return pyarrow.schema([(c, types[t]) for c, t in SCHEMAS[name].items()])
+
+
+def encode_addresses(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """
+    Replaces the hex ids of the address columns of a dataset by their codes.
+    """
+    schema: Dict[str, str] = SCHEMAS[name]
+    columns: List[str] = [c for c in df.columns
+        if schema.get(c) == 'address' and df[c].dtype == object]
+    if not columns:
+        return df
+
+    df = df.copy()
+    for c in columns:
+        df[c] = get_book().encode(df[c])
+
+    return df
+
+
+def apply_schema(df: pd.DataFrame, name: str, encode: bool = True) -> pd.DataFrame:
+    """
+    Casts the columns of a dataset to the dtypes of its schema.
+
+    Parameters:
+        * df: columns of the dataset
+        * name: key of SCHEMAS
+        * encode: converts the address columns to codes, otherwise they are
+            kept as hex ids
+    """
+    schema: Dict[str, str] = SCHEMAS[name]
+    if encode:
+        df = encode_addresses(df, name)
+
+    dtypes: Dict[str, str] = {c: schema[c] for c in df.columns if c in schema}
+    for c, t in dtypes.items():
+        if t == 'address':
+            dtypes[c] = 'int32' if encode else 'object'
+
+    # numbers requested as strings, e.g. timestamps, are parsed first
+    numeric: List[str] = [c for c, t in dtypes.items()
+        if t in ['int64', 'Int64', 'float64'] and df[c].dtype == object]
+    if numeric:
+        df = df.copy()
+        for c in numeric:
+            df[c] = pd.to_numeric(df[c])
+
+    return df.astype(dtypes)
+
+
+def write_columnar(name: str) -> None:
+    """
+    Writes the columnar copy of a CSV dataset chunk by chunk, so it does not
+    need to fit in memory. Nothing is done if pyarrow is not installed.
+    """
+    if pyarrow is None:
+        print(f'pyarrow is not installed: {name} is only stored as CSV')
+        return
+
+    path: str = get_path(name, 'parquet')
+    tmp_path: str = f'{path}.tmp'
+    csv_path: str = get_path(name, 'csv')
+
+    # the codes are given and saved before the file is written, so it holds
+    # the fingerprint of the book they are valid with
+    addresses: List[str] = [c for c, t in SCHEMAS[name].items() if t == 'address']
+    if addresses:
+        for chunk in pd.read_csv(csv_path, header=0, usecols=addresses, dtype=object,
+            chunksize=CHUNK_ROWS):
+            encode_addresses(chunk, name)
+        get_book().save()
+
+    schema = get_arrow_schema(name).with_metadata({BOOK_KEY: get_book().get_fingerprint()})
+    chunks = pd.read_csv(csv_path, header=0, dtype=get_csv_dtypes(name),
+        chunksize=CHUNK_ROWS)
+
+    with pyarrow.parquet.ParquetWriter(tmp_path, schema=schema) as writer:
+        for chunk in chunks:
+            chunk = encode_addresses(to_limbs(chunk, name)[schema.names], name)
+            writer.write_table(pyarrow.Table.from_pandas(chunk, schema=schema,
+                preserve_index=False))
+
+    os.replace(tmp_path, path)
+
+
+def write_table(df: pd.DataFrame, name: str) -> None:
+    """
+    Stores a dataset in the datawarehouse as CSV and as Parquet, with the
+    columns of its schema. The address columns must be hex ids.
+    """
+    df = apply_schema(df[list(SCHEMAS[name].keys())], name, encode=False)
+    from_limbs(df, name).to_csv(get_path(name, 'csv'), index=False)
+    write_columnar(name)
+
+
+def is_valid_copy(path: str) -> bool:
+    """
+    Checks that the codes of a Parquet copy were given by the address book,
+    which may have been removed or built again since it was written.
+    """
+    metadata: Dict[bytes, bytes] = pyarrow.parquet.read_schema(path).metadata or dict()
+    fingerprint: str = metadata.get(BOOK_KEY, b'').decode('utf-8')
+    if not fingerprint:
+        return False
+
+    return get_book().get_fingerprint(int(fingerprint.split(':')[0])) == fingerprint
+
+
+def read_table(name: str, columns: List[str] = None) -> pd.DataFrame:
+    """
+    Loads a dataset of the datawarehouse with the dtypes of its schema, the
+    address columns are loaded as codes, see common.addresses.
+
+    Parameters:
+        * name: key of SCHEMAS
+        * columns: columns to load, all by default
+    Return:
+        The Parquet copy if pyarrow is installed and the copy is not older
+        than the CSV file, the CSV file otherwise.
+    """
+    csv_path: str = get_path(name, 'csv')
+    path: str = get_path(name, 'parquet')
+
+    if pyarrow is not None and os.path.isfile(path) and is_valid_copy(path) and \
+        (not os.path.isfile(csv_path) or os.path.getmtime(path) >= os.path.getmtime(csv_path)):
+        schema: Dict[str, str] = SCHEMAS[name]
+        categories: List[str] = [c for c in (columns or schema.keys()) if schema[c] == 'category']
+        df: pd.DataFrame = pd.read_parquet(path, columns=columns,
+            read_dictionary=categories)
+    else:
+        df: pd.DataFrame = to_limbs(pd.read_csv(csv_path, header=0,
+            usecols=get_csv_columns(name, columns), dtype=get_csv_dtypes(name, columns)), name)
+
+    df = df[columns or list(SCHEMAS[name].keys())]
+
+    return apply_schema(df, name)
@@ -0,0 +1,37 @@
+import numpy as np
+from typing import Iterable, List, Tuple
+
+# wei amounts (REP, GEN, ...) have 18 decimals and overflow int64, so each
+# one is stored as two int64 limbs: hi, the whole tokens, and lo, the wei
+# left, amount = hi * WEI_SCALE + lo
+DECIMALS: int = 18
+WEI_SCALE: int = 10 ** DECIMALS
+HI: str = 'Hi'
+LO: str = 'Lo'
+
+
+def get_limb_columns(column: str) -> List[str]:
+    return [f'{column}{HI}', f'{column}{LO}']
+
+
+def split(amounts: Iterable) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts wei amounts, as integers or decimal strings, to their limbs.
+    Missing amounts are taken as 0.
+
+    Return:
+        The (hi, lo) int64 arrays.
+    """
+    limbs: List[Tuple[int, int]] = [divmod(int(a) if a is not None else 0, WEI_SCALE)
+        for a in amounts]
+    hi: np.ndarray = np.array([h for h, _ in limbs], dtype='int64')
+    lo: np.ndarray = np.array([w for _, w in limbs], dtype='int64')
+
+    return hi, lo
+
+
+def join(hi: np.ndarray, lo: np.ndarray) -> List[int]:
+    """
+    Gets back the exact wei amounts of the limbs as Python integers.
+    """
+    return [int(h) * WEI_SCALE + int(w) for h, w in zip(hi, lo)]
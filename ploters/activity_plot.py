@@ -1,9 +1,14 @@
 import os
+import sys
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
-from typing import Set, List
+from datetime import date
+from typing import Set
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.cube import read_cube, select
+from common.loader import load
 
 LIGHT_BLUE: str = '#d4e6f1'
 DARK_BLUE: str = '#2471a3'
@@ -11,86 +16,82 @@ GRID_COLOR: str = '#B0BEC5'
 
 def transform_to_monthly_date(df: pd.DataFrame) -> pd.DataFrame:
     dff: pd.DataFrame = df
-    dff['date'] = pd.to_datetime(dff['date'], unit='s')
-    dff['date'] = dff['date'].apply(lambda d: d.replace(day=1))
+    dates: np.ndarray = pd.to_datetime(dff['date'].astype('float64'), unit='s').to_numpy()
+    dff['date'] = pd.to_datetime(dates.astype('datetime64[M]'))
     return dff
 
 
-def get_months_between(date1: datetime, date2: datetime) -> int:
-    start: datetime = date1 if date1 < date2 else date2
-    end: datetime = date1 if date1 > date2 else date2
+def get_months_between(month: np.datetime64, dates: pd.Series) -> pd.Series:
+    """
+    Gets the months between a month and each date, both months included.
+    The missing dates get NaN.
+    """
+    months: np.ndarray = dates.to_numpy().astype('datetime64[M]')
+    missing: np.ndarray = np.isnat(months)
+    between: np.ndarray = np.abs(months - month).astype('int64') + 1
+    if missing.any():
+        between = np.where(missing, np.nan, between)
+
+    return pd.Series(between, index=dates.index)
 
-    return (end.year - start.year) * 12 + (end.month - start.month) + 1
 
+def calculate_recent_activity(df: pd.DataFrame, as_of: date) -> Set[int]:
+    """
+    Gets the DAOs with activity in the month before as_of or after it.
 
-def calculate_recent_activity(df: pd.DataFrame) -> Set[str]:
-    comp_date: datetime.date = datetime.today().date().replace(day=1)
-    comp_date = comp_date + relativedelta(months=-1)
-    actives: Set[str] = set()
+    Parameters:
+        * df: months with activity by DAO, 'daoId' and 'date' columns
+        * as_of: date the activity is calculated at
+    """
+    comp_month: np.datetime64 = np.datetime64(as_of, 'M') - 1
+    last_month: pd.Series = df.groupby(['daoId'])['date'].max()
 
-    ids: List[str] = df.groupby(['daoId']).size().reset_index()['daoId'].tolist()
-    for d_id in ids:
-        max_date = df[df['daoId'] == d_id]['date'].max()
-        if max_date >= comp_date:
-            actives.add(d_id)
+    return set(last_month[last_month >= pd.Timestamp(comp_month)].index.tolist())
 
-    return actives
 
+def calculate_month_activity(as_of: date = None) -> pd.DataFrame:
+    """
+    Gets the age of the DAOs and the number of months with activity.
 
-def calculate_month_activity() -> pd.DataFrame:
-    # get now date
-    now_date = datetime.now().replace(day=1)
-    # now_date = now_date + relativedelta(months=-1)
+    Parameters:
+        * as_of: date the ages and the recent activity are calculated at,
+            today by default
+    Return:
+        The DAOs with id, name, date (month of birth), monthLife, color
+        (darker if they are active) and activityMonths columns.
+    """
+    as_of = as_of if as_of else date.today()
+    month: np.datetime64 = np.datetime64(as_of, 'M')
 
     # load DAOs data
-    filename: str = os.path.join('datawarehouse', 'census.csv')
-    daos: pd.DataFrame = pd.read_csv(filename, header=0)
+    daos: pd.DataFrame = load('census', columns=['id', 'name', 'birth'])
     daos = daos.rename(columns={'birth': 'date'})
     daos = transform_to_monthly_date(daos)
 
-    # remove unused cols
-    daos = daos.drop(columns=['nUsers', 'nProposals', 'nVotes', 'nStakes',
-        'ETH', 'GEN', 'otherTokens'])
+    # let's add month between as_of date and DAO's birth date
+    daos['monthLife'] = get_months_between(month, daos['date'])
 
-    # let's add month between now date and DAO's birth date
-    daos['monthLife'] = 0
-    for i, r in daos.iterrows():
-        daos.loc[i, 'monthLife'] = get_months_between(now_date, r['date'])
-
-    # load activity registry
-    filename: str = os.path.join('datawarehouse', 'activity_serie.csv')
-    activity: pd.DataFrame = pd.read_csv(filename, header=0)
-    activity = activity.rename(columns={'unixDate': 'date'})
-    activity = transform_to_monthly_date(activity)
-    
-    # remove unused cols
-    activity = activity.drop(columns=['actionType', 'userId', 'daoName'])
+    # load the months with activity by DAO
+    activity: pd.DataFrame = select(read_cube(), by_dao=True)[['daoId', 'date']]
 
     # calculate activity months by DAO
-    activity['date'] = activity['date'].dt.date
-    activity = activity.groupby(['daoId', 'date']).size().reset_index()
-    active_daos: Set[str] = calculate_recent_activity(df=activity)
+    active_daos: Set[int] = calculate_recent_activity(df=activity, as_of=as_of)
     activity = activity.groupby(['daoId']).size().reset_index(name='activityMonths')
+    activity = activity.rename(columns={'daoId': 'id'})
 
     # add actives as color
-    daos['color'] = LIGHT_BLUE
-    for i, row in daos.iterrows():
-        if row['id'] in active_daos:
-            daos.loc[i, 'color'] = DARK_BLUE
+    daos['color'] = np.where(daos['id'].isin(active_daos), DARK_BLUE, LIGHT_BLUE)
 
     # add activity months to DAOs
-    daos['activityMonths'] = 0
-    for i, row in daos.iterrows():
-        r = activity[activity['daoId'] == row['id']]
-        if not r.empty:
-            daos.loc[i, 'activityMonths'] = r.iloc[0]['activityMonths']
+    daos = daos.merge(activity, on='id', how='left')
+    daos['activityMonths'] = daos['activityMonths'].fillna(0).astype('int64')
 
     print(daos)
     return daos
 
 
-if __name__ == '__main__':
-    daos = calculate_month_activity()
+def get_figure(as_of: date = None) -> go.Figure:
+    daos = calculate_month_activity(as_of=as_of)
     # sort by activityMonths
     daos = daos.sort_values(by=['activityMonths'])
 
@@ -143,4 +144,8 @@ if __name__ == '__main__':
         legend={'orientation': 'h', 'x': 0, 'y': 1.2}
     )
 
-    fig.show()
+    return fig
+
+
+if __name__ == '__main__':
+    get_figure().show()
@@ -1,4 +1,5 @@
 import os
+import sys
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
@@ -7,90 +8,58 @@ from typing import List
 
 from activity_plot import calculate_month_activity
 
-PLOT_COLOR: str = '#03A9F4'
-
-
-def fill_ids(df1: pd.DataFrame, df2: pd.DataFrame) -> pd.DataFrame:
-    df: pd.DataFrame = df1
-
-    for _, row in df2.iterrows():
-        r = df[df['id'] == row['id']]
-        if r.empty:
-            serie: pd.Series = pd.Series([row['id'], row['name'], 0], index=df.columns)
-            df = df.append(serie, ignore_index=True)
-
-    return df
-
-
-def join_df_by_id(df1: pd.DataFrame, df2: pd.DataFrame, keys: List[str])\
--> pd.DataFrame:
-
-    df: pd.DataFrame = df1
-    # initialization
-    for k in keys:
-        df[k] = 0
-
-    for i, row in df.iterrows():
-        try:
-            r = df2[df2['id'] == row['id']]
-            for k in keys:
-                df.loc[i, k] = r.iloc[0][k]
-        except:
-            pass
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.frames import join_df_by_id
+from common.loader import load
 
-    return df
+PLOT_COLOR: str = '#03A9F4'
 
 
 def calculate_boost_data() -> pd.DataFrame:
     # load daos stats
-    filename: str = os.path.join('datawarehouse', 'census.csv')
-    daos: pd.DataFrame = pd.read_csv(filename, header=0)
+    daos: pd.DataFrame = load('census',
+        columns=['id', 'name', 'nUsers', 'nVotes', 'nStakes'])
 
     # load proposals
-    filename: str = os.path.join('datawarehouse', 'proposals.csv')
-    props: pd.DataFrame = pd.read_csv(filename, header=0)
+    props: pd.DataFrame = load('proposals',
+        columns=['daoId', 'daoName', 'hasPassed', 'boostedAt', 'differentStakers'])
     props = props.rename(columns={'daoId': 'id'})
-
-    # add some stats
-    df = props.groupby(['id', 'daoName']).size().reset_index(name='nProposals')
-    df = fill_ids(df, daos)
-    df = join_df_by_id(df1=df, df2=daos, keys=['nUsers', 'nVotes', 'nStakes'])
-
-    # add proposal result
-    dff = props[props['hasPassed'] == True]
-    dff = dff.groupby(['id']).size().reset_index(name='nPropAccepted')
-    df = join_df_by_id(df1=df, df2=dff, keys=['nPropAccepted'])
-    dff = props[props['hasPassed'] == False]
-    dff = dff.groupby(['id']).size().reset_index(name='nPropRejected')
-    df = join_df_by_id(df1=df, df2=dff, keys=['nPropRejected'])
-    df['acceptedPercentage'] = None
-    df['rejectedPercentage'] = None
-
-    # add boost stats
-    dff = props[props['boostedAt'].notnull()]
-    dff = dff.groupby(['id']).size().reset_index(name='nBoost')
-    df = join_df_by_id(df1=df, df2=dff, keys=['nBoost'])
-    df['boostPercentage'] = None
-
+    props['daoName'] = props['daoName'].astype('object')
+    props['isBoosted'] = props['boostedAt'].notnull()
+    props['isStaked'] = props['differentStakers'] > 0
+
+    # add proposal, result, boost and stake stats in one pass
+    df = props.groupby(['id']).agg(
+        daoName=('daoName', 'first'),
+        nProposals=('hasPassed', 'size'),
+        nPropAccepted=('hasPassed', 'sum'),
+        nBoost=('isBoosted', 'sum'),
+        nPropStaked=('isStaked', 'sum'),
+    ).reset_index()
+    df['nPropRejected'] = df['nProposals'] - df['nPropAccepted']
+
+    # add DAOs without proposals
+    missing: pd.DataFrame = daos[~daos['id'].isin(df['id'])]
+    df = pd.concat([df, pd.DataFrame({'id': missing['id'], 'daoName': missing['name']})],
+        ignore_index=True, sort=False)
+    counts: List[str] = ['nProposals', 'nPropAccepted', 'nPropRejected', 'nBoost', 'nPropStaked']
+    df[counts] = df[counts].fillna(0).astype('int64')
+
+    df = join_df_by_id(df1=df, df2=daos, keys=['nUsers', 'nVotes', 'nStakes'], default=0)
+
+    # calculate new metrics, percentages are undefined without proposals
+    n_proposals: pd.Series = df['nProposals'].where(df['nProposals'] > 0)
+    df['acceptedPercentage'] = df['nPropAccepted'] / n_proposals * 100
+    df['rejectedPercentage'] = df['nPropRejected'] / n_proposals * 100
+    df['boostPercentage'] = df['nBoost'] / n_proposals * 100
     # stakePer = nStakes / nProposals * 100
-    dff = props[props['differentStakers'] > 0]
-    dff = dff.groupby(['id']).size().reset_index(name='nPropStaked')
-    df = join_df_by_id(df1=df, df2=dff, keys=['nPropStaked'])
-    df['stakePercentage'] = None
-
+    df['stakePercentage'] = df['nPropStaked'] / n_proposals * 100
     # activity = stakes + votes + proposals
-    df['activity'] = 0
-
-    # calculate new metrics
-    for i, row in df.iterrows():
-        df.loc[i, 'activity'] = row['nStakes'] + row['nVotes'] + row['nProposals'] 
-        if row['nProposals'] > 0:
-            df.loc[i, 'boostPercentage'] = row['nBoost'] / row['nProposals'] * 100
-            df.loc[i, 'stakePercentage'] = row['nPropStaked'] / row['nProposals'] * 100
-            df.loc[i, 'acceptedPercentage'] = row['nPropAccepted'] / row['nProposals'] * 100
-            df.loc[i, 'rejectedPercentage'] = row['nPropRejected'] / row['nProposals'] * 100
+    df['activity'] = df['nStakes'] + df['nVotes'] + df['nProposals']
 
-    return df
+    return df[['id', 'daoName', 'nProposals', 'nUsers', 'nVotes', 'nStakes',
+        'nPropAccepted', 'nPropRejected', 'acceptedPercentage', 'rejectedPercentage',
+        'nBoost', 'boostPercentage', 'nPropStaked', 'stakePercentage', 'activity']]
 
 
 def calculate_activity_ratio(df: pd.DataFrame) -> pd.DataFrame:
@@ -107,11 +76,11 @@ def calculate_activity_ratio(df: pd.DataFrame) -> pd.DataFrame:
     return dff
 
 
-if __name__ == '__main__':
+def get_figure() -> plt.Figure:
     df: pd.DataFrame = calculate_boost_data()
     df1: pd.DataFrame = calculate_month_activity()
 
-    df = join_df_by_id(df1=df, df2=df1, keys=['activityMonths', 'monthLife'])
+    df = join_df_by_id(df1=df, df2=df1, keys=['activityMonths', 'monthLife'], default=0)
     df = calculate_activity_ratio(df)
 
     # filters
@@ -144,4 +113,9 @@ if __name__ == '__main__':
     # j.annotate(stats.pearsonr)
     # j.annotate(stats.spearmanr)
 
+    return j.fig
+
+
+if __name__ == '__main__':
+    get_figure()
     plt.show()
@@ -1,19 +1,26 @@
 import os
+import sys
 import pandas as pd
 import plotly.graph_objects as go
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.loader import load
+
 GRID_COLOR: str = '#B0BEC5'
 
-if __name__ == '__main__':
-    filename: str = os.path.join('datawarehouse', 'census.csv')
-    df: pd.DataFrame = pd.read_csv(filename, header=0)
+def get_budget() -> pd.DataFrame:
+    df: pd.DataFrame = load('census', columns=['name', 'ETH', 'GEN', 'otherTokens'])
 
     # calculate total budget
     df['budget'] = df['ETH'] + df['GEN'] + df['otherTokens']
     df = df.sort_values(by=['budget'])
 
     # filter DAOs up to 1$
-    df = df[df['budget'] >= 1]
+    return df[df['budget'] >= 1]
+
+
+def get_figure(df: pd.DataFrame = None) -> go.Figure:
+    df = df if df is not None else get_budget()
 
     # budget stacked bar
     fig = go.Figure(data=[
@@ -63,7 +70,12 @@ if __name__ == '__main__':
             borderwidth=1
     ))
 
-    fig.show()
+    return fig
+
+
+if __name__ == '__main__':
+    df: pd.DataFrame = get_budget()
+    get_figure(df).show()
 
     # Show stats
     eth = sum(df['ETH'].tolist())
@@ -1,25 +1,37 @@
 import os
+import sys
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 from scipy import stats
-import plotly.graph_objects as go
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.loader import load
 
 PLOT_COLOR: str = '#03A9F4'
+# stats correlated with the number of users
+STATS: List[str] = ['nProposals', 'nVotes', 'nStakes', 'holdings']
 
-if __name__ == '__main__':
-    filename: str = os.path.join('datawarehouse', 'census.csv')
-    df: pd.DataFrame = pd.read_csv(filename, header=0)
+
+def get_figure(y_key: str) -> plt.Figure:
+    """
+    Gets the joint plot of the number of users and a DAO stat.
+
+    Parameters:
+        * y_key: key of STATS
+    """
+    df: pd.DataFrame = load('census',
+        columns=['nUsers', 'nProposals', 'nVotes', 'nStakes', 'ETH', 'GEN', 'otherTokens'])
 
     # calculate total holdings
     df['holdings'] = df['ETH'] + df['GEN'] + df['otherTokens']
 
     sns.set(style="white", color_codes=True)
 
-    # users vs proposals
     j = sns.jointplot(
         x=df["nUsers"], 
-        y=df["nProposals"], 
+        y=df[y_key], 
         kind='scatter', 
         s=100, 
         color=PLOT_COLOR, 
@@ -28,44 +40,12 @@ if __name__ == '__main__':
         alpha=0.5)
 
     j.annotate(stats.pearsonr)
+    return j.fig
 
-    # users vs votes
-    j = sns.jointplot(
-        x=df["nUsers"], 
-        y=df["nVotes"], 
-        kind='scatter', 
-        s=100, 
-        color=PLOT_COLOR, 
-        edgecolor='black', 
-        linewidth=0.7,
-        alpha=0.5)
-        
-    j.annotate(stats.pearsonr)
 
-    # users vs stakes
-    j = sns.jointplot(
-        x=df["nUsers"], 
-        y=df["nStakes"], 
-        kind='scatter', 
-        s=100, 
-        color=PLOT_COLOR, 
-        edgecolor='black', 
-        linewidth=0.7,
-        alpha=0.5)
-        
-    j.annotate(stats.pearsonr)
-
-    # users vs holdings
-    j = sns.jointplot(
-    x=df["nUsers"], 
-    y=df["holdings"], 
-    kind='scatter', 
-    s=100, 
-    color=PLOT_COLOR, 
-    edgecolor='black', 
-    linewidth=0.7,
-    alpha=0.5)
-
-    j.annotate(stats.pearsonr)
+if __name__ == '__main__':
+    # users vs proposals, votes, stakes and holdings
+    for key in STATS:
+        get_figure(key)
 
     plt.show()
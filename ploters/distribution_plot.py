@@ -1,9 +1,21 @@
 import os
+import sys
 import plotly.graph_objects as go
 import pandas as pd
+from typing import Dict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.loader import load
 
 GRID_COLOR: str = '#B0BEC5'
 BLUE: str = '#2471a3'
+# census counts and their label
+COUNTS: Dict[str, str] = {
+    'nUsers': 'users',
+    'nProposals': 'proposals',
+    'nVotes': 'votes',
+    'nStakes': 'stakes',
+}
 
 def update_layout(fig: go.Figure) -> None:
     fig.update_layout(
@@ -38,32 +50,18 @@ def update_layout(fig: go.Figure) -> None:
     )
 
 
-if __name__ == '__main__':
-    filename: str = os.path.join('datawarehouse', 'census.csv')
-    df: pd.DataFrame = pd.read_csv(filename, header=0)
-
-    # users
-    fig = go.Figure(data=[go.Histogram(
-        x=df['nUsers'].tolist(), 
-        xbins={'size': 10.0, 'start': 1.0},
-        marker_color=BLUE,
-        name='DAOs in bins of 10',
-        )])
-
-    fig.add_trace(go.Scatter(
-        x=[0, 0], 
-        y=[0, len(df[df['nUsers'] == 0])],
-        line=dict(color='firebrick', width=4),
-        name='DAOs with 0 users'
-        ))
+def get_figure(key: str) -> go.Figure:
+    """
+    Gets the histogram of the DAOs by a census count.
 
-    update_layout(fig=fig)
-    fig.update_layout(xaxis_title_text='Number of users', yaxis_title_text='Number of DAOs')
-    fig.show()
+    Parameters:
+        * key: key of COUNTS
+    """
+    df: pd.DataFrame = load('census', columns=[key])
+    label: str = COUNTS[key]
 
-    # proposals
     fig = go.Figure(data=[go.Histogram(
-        x=df['nProposals'].tolist(), 
+        x=df[key].tolist(), 
         xbins={'size': 10.0, 'start': 1.0},
         marker_color=BLUE,
         name='DAOs in bins of 10',
@@ -71,49 +69,16 @@ if __name__ == '__main__':
 
     fig.add_trace(go.Scatter(
         x=[0, 0], 
-        y=[0, len(df[df['nProposals'] == 0])],
+        y=[0, len(df[df[key] == 0])],
         line=dict(color='firebrick', width=4),
-        name='DAOs with 0 proposals'
+        name=f'DAOs with 0 {label}'
         ))
 
     update_layout(fig=fig)
-    fig.update_layout(xaxis_title_text='Number of proposals', yaxis_title_text='Number of DAOs')
-    fig.show()
+    fig.update_layout(xaxis_title_text=f'Number of {label}', yaxis_title_text='Number of DAOs')
+    return fig
 
-    # votes
-    fig = go.Figure(data=[go.Histogram(
-        x=df['nVotes'].tolist(), 
-        xbins={'size': 10.0, 'start': 1.0},
-        marker_color=BLUE,
-        name='DAOs in bins of 10',
-        )])
 
-    fig.add_trace(go.Scatter(
-        x=[0, 0], 
-        y=[0, len(df[df['nVotes'] == 0])],
-        line=dict(color='firebrick', width=4),
-        name='DAOs with 0 votes'
-        ))
-
-    update_layout(fig=fig)
-    fig.update_layout(xaxis_title_text='Number of votes', yaxis_title_text='Number of DAOs')
-    fig.show()
-
-    # stakes
-    fig = go.Figure(data=[go.Histogram(
-        x=df['nStakes'].tolist(), 
-        xbins={'size': 10.0, 'start': 1.0},
-        marker_color=BLUE,
-        name='DAOs in bins of 10',
-        )])
-
-    fig.add_trace(go.Scatter(
-        x=[0, 0], 
-        y=[0, len(df[df['nStakes'] == 0])],
-        line=dict(color='firebrick', width=4),
-        name='DAOs with 0 stakes'
-        ))
-
-    update_layout(fig=fig)
-    fig.update_layout(xaxis_title_text='Number of stakes', yaxis_title_text='Number of DAOs')
-    fig.show()
+if __name__ == '__main__':
+    for key in COUNTS:
+        get_figure(key).show()
@@ -1,87 +1,71 @@
 import os
+import sys
 import pandas as pd
 import plotly.graph_objects as go
 from typing import List, Dict
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.loader import load
+
 BLUE: str = '#2471a3'
 RED: str = '#C62828'
 GRID_COLOR: str = '#B0BEC5'
 
-def get_daos() -> List[str]:
-    filename: str = os.path.join('datawarehouse', 'census.csv')
-    return pd.read_csv(filename, header=0)
+def get_daos() -> pd.DataFrame:
+    return load('census', columns=['id', 'name', 'nUsers', 'nProposals'])
 
 
 def get_proposals() -> pd.DataFrame:
-    filename: str = os.path.join('datawarehouse', 'proposals.csv')
-    return pd.read_csv(filename, header=0)
-
-
-def calculate_ratio(tp: int, tn: int, fp: int, fn: int) -> float:
-    numerator: int = tp + tn
-    denominator: int = tp + tn + fp + fn
-
-    return round(numerator / denominator, 2) if denominator > 0 else None
+    return load('proposals', columns=['daoId', 'hasPassed', 'boostedAt'])
 
 
-def get_validation_value(df: pd.DataFrame, valid: str) -> int:
-    """ 
-    True positives = boost and pass
-    True negatives = not boost and not pass
-    False positives = boost and not pass
-    False negatives = not boost and pass
+def get_prediction_metrics(proposals: pd.DataFrame, ids: List[int] = None) -> pd.DataFrame:
+    """
+    Calculates how well boosting predicts that a proposal passes, by DAO
+    and in one pass over the proposals.
+        True positives = boost and pass
+        True negatives = not boost and not pass
+        False positives = boost and not pass
+        False negatives = not boost and pass
 
     Parameters:
-        * df = data frame to filter
-        * valid = must be 'tp', 'tn', 'fp', 'fn' in other case return true 
-                    positive by default.
+        * proposals = data frame with daoId, hasPassed and boostedAt columns
+        * ids = DAOs to return, all the DAOs with proposals by default
     Return:
-        The number of 'valid' parameter.
+        A data frame indexed by daoId with tp, tn, fp, fn, accuracy,
+        precision and recall columns. The ratios are NaN when they are
+        undefined, e.g. the accuracy of a DAO without proposals.
     """
-    boosted: bool = True
-    approved: bool = True
-
-    if valid == 'tn':
-        boosted = False
-        approved = False
-    elif valid == 'fp':
-        approved = False
-    elif valid == 'fn':
-        boosted = False
-
-    dff = df[df['hasPassed'] == approved]
-    if boosted:
-        dff = dff[dff.boostedAt.notnull()]
-    else:
-        dff = dff[~dff.boostedAt.notnull()]
-
-    return len(dff.index)
+    counts: pd.DataFrame = pd.crosstab(
+        index=proposals['daoId'],
+        columns=[proposals['boostedAt'].notna().rename('boosted'), proposals['hasPassed']])
+    counts = counts.reindex(columns=pd.MultiIndex.from_product([[True, False], [True, False]]),
+        fill_value=0)
+    if ids is not None:
+        counts = counts.reindex(index=ids, fill_value=0)
 
+    df: pd.DataFrame = pd.DataFrame({
+        'tp': counts[(True, True)],
+        'tn': counts[(False, False)],
+        'fp': counts[(True, False)],
+        'fn': counts[(False, True)],
+    }, index=counts.index).astype('int64')
 
-def get_prediction_accuracy(ids: List[str], proposals: pd.DataFrame) -> Dict[str, float]:
-    accuracy: Dict[str, float] = dict()
+    total: pd.Series = df['tp'] + df['tn'] + df['fp'] + df['fn']
+    predicted: pd.Series = df['tp'] + df['fp']
+    passed: pd.Series = df['tp'] + df['fn']
 
-    for d_id in ids:
-        df: pd.DataFrame = proposals[proposals['daoId'] == d_id]
+    df['accuracy'] = (df['tp'] + df['tn']) / total.where(total > 0)
+    df['precision'] = df['tp'] / predicted.where(predicted > 0)
+    df['recall'] = df['tp'] / passed.where(passed > 0)
 
-        tp: int = get_validation_value(df=df, valid='tp')
-        tn: int = get_validation_value(df=df, valid='tn')
-        fp: int = get_validation_value(df=df, valid='fp')
-        fn: int = get_validation_value(df=df, valid='fn')
+    return df
 
-        accuracy[d_id] = calculate_ratio(tp=tp, tn=tn, fp=fp, fn=fn)
 
-    return accuracy
+def get_prediction_accuracy(ids: List[int], proposals: pd.DataFrame) -> Dict[int, float]:
+    accuracy: pd.Series = get_prediction_metrics(proposals=proposals, ids=ids)['accuracy']
 
-
-def add_dict_param(df: pd.DataFrame, param: Dict, name: str) -> pd.DataFrame:
-    dff: pd.DataFrame = df
-    dff[name] = 0
-
-    for i, row in dff.iterrows():
-        dff.loc[i, name] = param[row['id']]
-
-    return dff
+    return {d_id: round(a, 2) if pd.notna(a) else None for d_id, a in accuracy.items()}
 
 
 def update_layout(fig: go.Figure) -> None:
@@ -116,13 +100,13 @@ def update_layout(fig: go.Figure) -> None:
     )
 
 
-if __name__ == '__main__':
+def get_figure() -> go.Figure:
     daos: pd.DataFrame = get_daos()
     proposals: pd.DataFrame = get_proposals()
-    accuracy: Dict[str, float] = get_prediction_accuracy(ids=daos['id'].tolist(), proposals=proposals)
+    metrics: pd.DataFrame = get_prediction_metrics(proposals=proposals, ids=daos['id'].tolist())
 
     # add accuracy as new parameter
-    daos = add_dict_param(df=daos, param=accuracy, name='accuracy')
+    daos['accuracy'] = daos['id'].map(metrics['accuracy']).round(2)
 
     # sort by number of users
     daos = daos.sort_values(by=['nUsers'])
@@ -241,4 +225,8 @@ if __name__ == '__main__':
         )))
 
     update_layout(fig=fig)
-    fig.show()
+    return fig
+
+
+if __name__ == '__main__':
+    get_figure().show()
@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+import argparse
+import importlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+# no display is needed, matplotlib draws to files
+os.environ['MPLBACKEND'] = 'Agg'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.loader import preload
+
+OUT_DIR: str = 'report'
+FORMATS: List[str] = ['png', 'svg', 'html']
+DEFAULT_FORMATS: str = 'png,html'
+MAX_WORKERS: int = os.cpu_count() or 1
+# datasets the figures load, they are parsed once before the workers start
+DATASETS: List[str] = ['census', 'proposals', 'activity_cube']
+
+# file name, ploter module, function which returns the figure and its arguments
+FIGURES: List[Tuple[str, str, str, Dict]] = [
+    ('activity_months', 'activity_plot', 'get_figure', {}),
+    ('boosting_stakes', 'boosting_correlation_plot', 'get_figure', {}),
+    ('budget', 'budget_plot', 'get_figure', {}),
+    ('users_vs_proposals', 'dao_stats_correlation_plot', 'get_figure', {'y_key': 'nProposals'}),
+    ('users_vs_votes', 'dao_stats_correlation_plot', 'get_figure', {'y_key': 'nVotes'}),
+    ('users_vs_stakes', 'dao_stats_correlation_plot', 'get_figure', {'y_key': 'nStakes'}),
+    ('users_vs_holdings', 'dao_stats_correlation_plot', 'get_figure', {'y_key': 'holdings'}),
+    ('users_distribution', 'distribution_plot', 'get_figure', {'key': 'nUsers'}),
+    ('proposals_distribution', 'distribution_plot', 'get_figure', {'key': 'nProposals'}),
+    ('votes_distribution', 'distribution_plot', 'get_figure', {'key': 'nVotes'}),
+    ('stakes_distribution', 'distribution_plot', 'get_figure', {'key': 'nStakes'}),
+    ('prediction_rate', 'prediction_rate_plot', 'get_figure', {}),
+    ('active_daos', 'time_serie_plot', 'get_serie_figure', {'serie': 'daos'}),
+    ('active_users', 'time_serie_plot', 'get_serie_figure', {'serie': 'users'}),
+    ('new_proposals', 'time_serie_plot', 'get_serie_figure', {'serie': 'proposals'}),
+    ('total_actions', 'time_serie_plot', 'get_serie_figure', {'serie': 'actions'}),
+]
+
+
+def save(fig, path: str, formats: List[str]) -> List[str]:
+    """
+    Writes a plotly or matplotlib figure in each format. Plotly needs an
+    image engine (orca or kaleido) for png and svg, and matplotlib figures
+    can not be written as html, those formats are skipped.
+
+    Return:
+        The paths written.
+    """
+    paths: List[str] = list()
+
+    for f in formats:
+        out: str = f'{path}.{f}'
+
+        if hasattr(fig, 'write_html'):
+            if f == 'html':
+                fig.write_html(out, include_plotlyjs='cdn')
+            else:
+                try:
+                    fig.write_image(out)
+                except (ValueError, ImportError, OSError, RuntimeError) as e:
+                    print(f'{os.path.basename(path)}: {f} skipped, {str(e).strip().splitlines()[0]}')
+                    continue
+        elif f != 'html':
+            fig.savefig(out, format=f, bbox_inches='tight')
+        else:
+            continue
+
+        paths.append(out)
+
+    if not hasattr(fig, 'write_html'):
+        import matplotlib.pyplot as plt
+        plt.close(fig)
+
+    return paths
+
+
+def render(name: str, module: str, function: str, kwargs: Dict, out_dir: str,
+    formats: List[str]) -> Tuple[str, List[str], float]:
+    """
+    Builds a figure and writes it, it runs in a worker process.
+
+    Return:
+        The figure name, the paths written and the seconds it took.
+    """
+    start: float = time.time()
+    fig = getattr(importlib.import_module(module), function)(**kwargs)
+    paths: List[str] = save(fig=fig, path=os.path.join(out_dir, name), formats=formats)
+
+    return name, paths, time.time() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Renders all the figures to files.')
+    parser.add_argument('--out', default=OUT_DIR, help=f'output directory, {OUT_DIR} by default')
+    parser.add_argument('--formats', default=DEFAULT_FORMATS,
+        help=f'comma separated formats of {", ".join(FORMATS)}, {DEFAULT_FORMATS} by default')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS,
+        help='number of processes, one by CPU by default')
+    parser.add_argument('--only', default='',
+        help='comma separated names of the figures to render, all by default')
+    args = parser.parse_args()
+
+    formats: List[str] = [f for f in args.formats.split(',') if f]
+    unknown: List[str] = [f for f in formats if f not in FORMATS]
+    if unknown:
+        parser.error(f'unknown formats: {", ".join(unknown)}')
+
+    only: List[str] = [n for n in args.only.split(',') if n]
+    figures: List[Tuple[str, str, str, Dict]] = [f for f in FIGURES if not only or f[0] in only]
+
+    os.makedirs(args.out, exist_ok=True)
+    start: float = time.time()
+    failed: List[str] = list()
+    preload(DATASETS)
+
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(figures)))) as executor:
+        futures = {executor.submit(render, *f, args.out, formats): f[0] for f in figures}
+
+        for future in as_completed(futures):
+            try:
+                name, paths, seconds = future.result()
+                print(f'{name} rendered in {seconds:.2f}s: {", ".join(paths)}')
+            except Exception as e:
+                failed.append(futures[future])
+                print(f'{futures[future]} failed: {e!r}')
+
+    print(f'DONE. {len(figures) - len(failed)} figures rendered in {args.out} in '
+        f'{time.time() - start:.2f}s')
+    if failed:
+        sys.exit(1)
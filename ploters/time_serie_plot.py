@@ -1,11 +1,19 @@
 import os
+import sys
+import argparse
 import pandas as pd
 import plotly.graph_objects as go
+from typing import List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.cube import read_cube, select
+from common.sketches import count_distinct, read_sketches
 
 DATE_FORMAT: str = '%b, %Y'
 DARK_BLUE: str = '#2471a3'
 LIGHT_BLUE: str = '#d4e6f1'
 GRID_COLOR: str = '#B0BEC5'
+SERIES: List[str] = ['daos', 'users', 'proposals', 'actions']
 
 
 def update_layout(df: pd.DataFrame, fig: go.Figure) -> None:
@@ -40,7 +48,7 @@ def update_layout(df: pd.DataFrame, fig: go.Figure) -> None:
     )
 
 
-def plot(df: pd.DataFrame, y_key: str) -> None:
+def get_figure(df: pd.DataFrame, y_key: str) -> go.Figure:
     colors: list = [DARK_BLUE] * len(df.index)
     colors[-1] = LIGHT_BLUE
 
@@ -55,55 +63,80 @@ def plot(df: pd.DataFrame, y_key: str) -> None:
     ])
 
     update_layout(df, fig)
-    fig.show()
+    return fig
+
+
+def plot(df: pd.DataFrame, y_key: str) -> None:
+    get_figure(df, y_key).show()
+
+
+def get_active_users(cube: pd.DataFrame, approx: bool) -> pd.DataFrame:
+    """
+    Gets the active users by month, estimated from the stored sketches if
+    approx, otherwise the exact count of the cube.
+    """
+    if not approx:
+        return select(cube, by_dao=False).rename(columns={'nUsers': 'actives'})
+
+    dff: pd.DataFrame = count_distinct(read_sketches(), by=['month'])
+    dff['date'] = pd.to_datetime(dff['month'], unit='s')
+
+    return dff.rename(columns={'nUsers': 'actives'})
+
+
+def get_serie(cube: pd.DataFrame, serie: str, approx: bool = False) -> Tuple[pd.DataFrame, str]:
+    """
+    Gets a serie by month of the cube.
 
+    Parameters:
+        * cube: the cube, see read_cube
+        * serie: key of SERIES
+        * approx: estimate the active users, see get_active_users
+    Return:
+        The serie and the name of its values column.
+    """
+    if serie == 'daos':
+        dff = select(cube, by_dao=True)
+        return dff.groupby(['date']).size().reset_index(name='actives'), 'actives'
+    if serie == 'users':
+        return get_active_users(cube=cube, approx=approx), 'actives'
+    if serie == 'proposals':
+        dff = select(cube, by_dao=False, action_type='proposal')
+        return dff.rename(columns={'nActions': 'nProposals'}), 'nProposals'
 
-def process_df(df: pd.DataFrame, key_id: str) -> pd.DataFrame:
-    dff = df
-    dff = dff.groupby([key_id, 'date']).size().reset_index(name='nActions')
+    dff = select(cube, by_dao=False)
+    return dff.rename(columns={'nActions': 'actions'}), 'actions'
 
-    # before remove nActions use it if you want to filter more than one action
-    dff = dff.drop(columns=['nActions'])
-    dff = dff.groupby(['date']).size().reset_index(name='actives')
 
-    return dff
+def get_serie_figure(serie: str, approx: bool = False) -> go.Figure:
+    dff, y_key = get_serie(cube=read_cube(), serie=serie, approx=approx)
+    return get_figure(dff, y_key)
 
 
 if __name__ == '__main__':
-    filename: str = os.path.join('datawarehouse', 'activity_serie.csv')
-    df: pd.DataFrame = pd.read_csv(filename, header=0)
+    parser = argparse.ArgumentParser(description='Plots the activity by month.')
+    parser.add_argument('--approx', action='store_true',
+        help='estimates the active users with the stored sketches')
+    args = parser.parse_args()
 
-    # let's transform the date
-    df['unixDate'] = pd.to_datetime(df['unixDate'], unit='s').dt.date
-    df = df.rename(columns={'unixDate': 'date'})
-    # transform to monthly date
-    df['date'] = df['date'].apply(lambda d: d.replace(day=1))
+    cube: pd.DataFrame = read_cube()
 
     # active DAOs
-    dff = df.drop(columns=['daoName', 'actionType', 'userId'])
-    dff = process_df(dff, 'daoId')
-    print(f'Mean active DAOs = {sum(dff["actives"].tolist()) / len(dff["actives"].tolist())}')
-    plot(dff, 'actives')
+    dff, y_key = get_serie(cube=cube, serie='daos')
+    print(f'Mean active DAOs = {sum(dff[y_key].tolist()) / len(dff[y_key].tolist())}')
+    plot(dff, y_key)
 
     # active users
-    dff = df
-    #dff = dff[dff['daoId'] == '0x294f999356ed03347c7a23bcbcf8d33fa41dc830']
-    dff = dff.drop(columns=['daoName', 'daoId', 'actionType'])
-    dff = process_df(dff, 'userId')
-    print(f'Mean active users = {sum(dff["actives"].tolist()) / len(dff["actives"].tolist())}')
-    plot(dff, 'actives')
+    dff, y_key = get_serie(cube=cube, serie='users', approx=args.approx)
+    print(f'Mean active users = {sum(dff[y_key].tolist()) / len(dff[y_key].tolist())}')
+    plot(dff, y_key)
 
     # new proposals
-    dff = df[df['actionType'] == 'proposal']
-    dff = dff.drop(columns=['daoName', 'daoId', 'actionType', 'userId'])
-    dff = dff.groupby(['date']).size().reset_index(name='nProposals')
-    print(f'Total proposals = {sum(dff["nProposals"].tolist())}')
-    plot(dff, 'nProposals')
+    dff, y_key = get_serie(cube=cube, serie='proposals')
+    print(f'Total proposals = {sum(dff[y_key].tolist())}')
+    plot(dff, y_key)
 
     # total actions
-    dff = df
-    # dff = dff[dff['daoId'] == '0x294f999356ed03347c7a23bcbcf8d33fa41dc830']
-    dff = dff.drop(columns=['daoName', 'daoId', 'actionType', 'userId'])
-    dff = dff.groupby(['date']).size().reset_index(name='actions')
-    print(f'Total actions = {sum(dff["actions"].tolist())}')
-    plot(dff, 'actions')
+    dff, y_key = get_serie(cube=cube, serie='actions')
+    print(f'Total actions = {sum(dff[y_key].tolist())}')
+    plot(dff, y_key)
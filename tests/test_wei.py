@@ -0,0 +1,18 @@
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import wei
+
+# amounts around 1e24 wei, over int64 and the 53 bits of a float64
+AMOUNTS = [0, 1, wei.WEI_SCALE - 1, wei.WEI_SCALE, 10 ** 24 + 1, 123456789 * 10 ** 18 + 987654321,
+    2 ** 80 + 12345]
+
+
+def test_split_join_round_trip():
+    hi, lo = wei.split([str(a) for a in AMOUNTS] + [None])
+
+    assert hi.dtype == np.int64 and lo.dtype == np.int64
+    assert (lo >= 0).all() and (lo < wei.WEI_SCALE).all()
+    assert wei.join(hi, lo) == AMOUNTS + [0]